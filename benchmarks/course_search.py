@@ -0,0 +1,111 @@
+"""
+latencies of course name typeahead queries, Course.name LIKE against the
+in memory n-gram index, and of ranked autocomplete, on a synthetic catalog
+
+    SSAPI_SETTINGS=/path/to/scratch.env python benchmarks/course_search.py
+
+the database named by the settings is dropped and recreated
+"""
+import argparse
+import random
+import time
+from sqlalchemy import asc
+from ssapi import create_app
+from ssapi.catalog import catalog
+from ssapi.db import db, Course
+
+WORDS = (
+    'Introduction', 'Calculus', 'Linear', 'Algebra', 'Data', 'Structures',
+    'Organic', 'Chemistry', 'Physics', 'Biology', 'Writing', 'Expository',
+    'History', 'Modern', 'Europe', 'Economics', 'Principles', 'Statistics',
+    'Computer', 'Architecture', 'Systems', 'Programming', 'Theory', 'Art',
+    'Music', 'Psychology', 'Sociology', 'Philosophy', 'Ethics', 'Genetics',
+)
+
+QUERIES = ('c', 'ca', 'cal', 'calc', 'calculus', 'intro', 'ry', 'data str',
+           'programming', 'zz', 'a', 'e')
+
+
+def seed(courses):
+    db.drop_all()
+    db.create_all()
+
+    db.session.execute(Course.__table__.insert(), [{
+        'name': ' '.join(random.sample(WORDS, random.randint(1, 4))),
+        'offering_unit': '01',
+        'subject': '%03d' % (n // 1000),
+        'course_number': '%03d' % (n % 1000),
+    } for n in range(courses)])
+
+    db.session.commit()
+
+
+def sql_search(query, limit):
+    return Course.query \
+        .filter(Course.name.like('%{}%'.format(query))) \
+        .order_by(asc(Course.name)) \
+        .limit(limit) \
+        .all()
+
+
+def index_search(query, limit):
+    return catalog.index.search(query, limit)
+
+
+def autocomplete(query, limit):
+    return catalog.index.autocomplete(query, limit)
+
+
+def measure(search, query, limit, repeat):
+    timings = []
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        search(query, limit)
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+
+    return timings[len(timings) // 2], timings[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--courses', type=int, default=10000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        print('seeding {} courses'.format(args.courses))
+        seed(args.courses)
+
+        started = time.perf_counter()
+        catalog.index
+        print('index built in {:.1f} ms'.format((time.perf_counter() - started) * 1000))
+
+        for query in QUERIES:
+            # same matches, sql orders by the collation of the database
+            found = [c['id'] for c in index_search(query, args.limit)]
+            expected = [c.id for c in sql_search(query, args.limit)]
+
+            sql_median, sql_worst = measure(sql_search, query, args.limit, args.repeat)
+            index_median, index_worst = measure(index_search, query, args.limit, args.repeat)
+
+            print('{!r}: sql median {:.3f} ms, max {:.3f} ms; '
+                  'index median {:.3f} ms, max {:.3f} ms{}'
+                  .format(query, sql_median * 1000, sql_worst * 1000,
+                          index_median * 1000, index_worst * 1000,
+                          '' if sorted(found) == sorted(expected) else ' (results differ)'))
+
+        for query in QUERIES + ('01:', '01:0', '01:001:1'):
+            median, worst = measure(autocomplete, query, args.limit, args.repeat)
+
+            print('autocomplete {!r}: median {:.3f} ms, max {:.3f} ms'
+                  .format(query, median * 1000, worst * 1000))
+
+
+if __name__ == '__main__':
+    main()
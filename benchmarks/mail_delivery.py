@@ -0,0 +1,97 @@
+"""
+throughput of sending every message over a connection of its own against
+draining the outbox in batches over one session, to a local smtp sink that
+takes --latency seconds to accept a connection like a remote server would
+
+    SSAPI_SETTINGS=/path/to/scratch.env python benchmarks/mail_delivery.py
+
+the outbox is kept in the redis of the settings
+"""
+import argparse
+import asyncore
+import smtpd
+import threading
+import time
+from flask_mail import Message
+from ssapi import create_app
+from ssapi.cache import cache
+from ssapi.outbox import Outbox
+from ssapi.tasks import mail
+
+
+class Sink(smtpd.SMTPServer):
+    """
+    accepts and counts every message, slowly opening every connection
+    """
+
+    def __init__(self, address, latency):
+        super().__init__(address, None, decode_data=True)
+        self.latency = latency
+        self.received = 0
+
+    def handle_accepted(self, conn, addr):
+        time.sleep(self.latency)
+        super().handle_accepted(conn, addr)
+
+    def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+        self.received += 1
+
+
+def messages(count):
+    return [Message('subject', recipients=['user%d@rutgers.edu' % n], body='body')
+            for n in range(count)]
+
+
+def per_message(count):
+    for message in messages(count):
+        mail.send(message)
+
+
+def outbox(count):
+    box = Outbox(mail, cache.connection)
+
+    for message in messages(count):
+        box.put(message)
+
+    return box.drain()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    sink = Sink(('127.0.0.1', 0), args.latency)
+    host, port = sink.socket.getsockname()
+    threading.Thread(target=asyncore.loop, kwargs={'timeout': 0.1}, daemon=True).start()
+
+    app = create_app()
+    app.config.update(MAIL_SERVER=host, MAIL_PORT=port, MAIL_USE_TLS=False,
+                      MAIL_USE_SSL=False, MAIL_USERNAME=None, MAIL_PASSWORD=None,
+                      MAIL_SUPPRESS_SEND=False, MAIL_BATCH_SIZE=args.batch_size)
+    mail.init_app(app)
+
+    with app.app_context():
+        for name, deliver in (('connection per message', per_message),
+                              ('outbox', outbox)):
+            received = sink.received
+            started = time.perf_counter()
+            deliver(args.messages)
+            elapsed = time.perf_counter() - started
+
+            # the sink may still be handling the last message
+            deadline = time.monotonic() + 10
+
+            while sink.received - received < args.messages and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            assert sink.received - received == args.messages
+
+            print('{}: {} messages in {:.2f} s, {:.0f} messages/s'
+                  .format(name, args.messages, elapsed, args.messages / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+latency of password hashing and verification against the hash cost, and
+of a burst of logins through the bounded hashing slots
+
+    SSAPI_SETTINGS=/path/to/scratch.env python benchmarks/password_hashing.py
+
+pick PASSWORD_HASH_ROUNDS so a verification stays well under the request
+budget, the burst shows how long logins queue for a given concurrency
+"""
+import argparse
+import threading
+import time
+from werkzeug.exceptions import HTTPException
+from ssapi import create_app
+from ssapi.praetorian import guard
+
+ROUNDS = (5000, 10000, 25000, 50000, 100000, 200000)
+
+
+def measure(f, repeat):
+    timings = []
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        f()
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+
+    return timings[len(timings) // 2], timings[-1]
+
+
+def burst(app, logins, password_hash):
+    """
+    logins verifications at once, each from a thread of its own like
+    concurrent requests, with their latencies and how many were turned away
+    """
+    latencies = []
+    busy = []
+    start = threading.Event()
+
+    def login():
+        with app.app_context():
+            start.wait()
+            started = time.perf_counter()
+
+            try:
+                with guard.hashing():
+                    guard.pwd_ctx.verify('password123', password_hash)
+            except HTTPException:
+                busy.append(1)
+                return
+
+            latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=login) for _ in range(logins)]
+
+    for thread in threads:
+        thread.start()
+
+    started = time.perf_counter()
+    start.set()
+
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+
+    return time.perf_counter() - started, latencies, len(busy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--logins', type=int, default=32)
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        for rounds in ROUNDS:
+            password_hash = guard.pwd_ctx.hash('password123', rounds=rounds)
+
+            hash_median, hash_worst = measure(
+                lambda: guard.pwd_ctx.hash('password123', rounds=rounds), args.repeat)
+            verify_median, verify_worst = measure(
+                lambda: guard.pwd_ctx.verify('password123', password_hash), args.repeat)
+
+            print('{} rounds: hash median {:.1f} ms, max {:.1f} ms; '
+                  'verify median {:.1f} ms, max {:.1f} ms'
+                  .format(rounds, hash_median * 1000, hash_worst * 1000,
+                          verify_median * 1000, verify_worst * 1000))
+
+        password_hash = guard.encrypt_password('password123')
+
+    print('burst of {} logins at {} rounds, {} at once, waiting up to {} s'
+          .format(args.logins, app.config['PASSWORD_HASH_ROUNDS'],
+                  app.config['PASSWORD_HASH_CONCURRENCY'], app.config['PASSWORD_HASH_WAIT']))
+
+    elapsed, latencies, busy = burst(app, args.logins, password_hash)
+
+    if latencies:
+        print('{:.1f} ms in all; login median {:.1f} ms, max {:.1f} ms; {} turned away'
+              .format(elapsed * 1000, latencies[len(latencies) // 2] * 1000,
+                      latencies[-1] * 1000, busy))
+    else:
+        print('{:.1f} ms in all; all {} turned away'.format(elapsed * 1000, busy))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+query plans and latencies of the GET /posts/ filters before and after the
+post filter indexes, on a large synthetic dataset
+
+    SSAPI_SETTINGS=/path/to/scratch.env python benchmarks/post_indexes.py
+
+the database named by the settings is dropped and recreated, point it at
+mysql for numbers that match production
+
+without the post filter indexes the foreign keys they lead with get plain
+indexes of their own, as innodb had before them and needs for the foreign
+key constraints
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import Index, text
+from ssapi import create_app
+from ssapi.db import db, Category, Comment, Course, Post, Semester, User
+
+INDEXES = (
+    'ix_post_is_deleted_timestamp',
+    'ix_post_course_id_is_deleted_timestamp',
+    'ix_post_category_id_is_deleted_timestamp',
+    'ix_post_is_deleted_due_date',
+    'ix_comment_post_id_timestamp',
+)
+
+FOREIGN_KEYS = (
+    ('post', 'course_id'),
+    ('post', 'category_id'),
+    ('comment', 'post_id'),
+)
+
+QUERIES = (
+    ('latest',
+     'SELECT id FROM post WHERE is_deleted = 0 ORDER BY timestamp DESC LIMIT 20'),
+    ('courses',
+     'SELECT id FROM post WHERE course_id IN (:a, :b, :c) AND is_deleted = 0 '
+     'ORDER BY timestamp DESC LIMIT 20'),
+    ('category',
+     'SELECT id FROM post WHERE category_id IN (:a) AND is_deleted = 0 '
+     'ORDER BY timestamp DESC LIMIT 20'),
+    ('due dates',
+     'SELECT id FROM post WHERE is_deleted = 0 AND due_date >= :start AND due_date < :end '
+     'ORDER BY timestamp DESC LIMIT 20'),
+    ('comments',
+     'SELECT id FROM comment WHERE post_id = :a ORDER BY timestamp'),
+)
+
+BATCH_SIZE = 10000
+
+
+def insert_batched(table, rows):
+    batch = []
+
+    for row in rows:
+        batch.append(row)
+
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            batch = []
+
+    if batch:
+        db.session.execute(table.insert(), batch)
+
+
+def seed(posts, comments, courses, categories):
+    db.drop_all()
+    db.create_all()
+
+    start = datetime(2018, 1, 1)
+
+    insert_batched(User.__table__, [{
+        'email': 'bench@rutgers.edu', 'password': '42', 'is_verified': True
+    }])
+    insert_batched(Semester.__table__, [{'year': 2018, 'season': 'Fall'}])
+    insert_batched(Category.__table__, (
+        {'name': 'category%d' % n} for n in range(categories)))
+    insert_batched(Course.__table__, (
+        {'name': 'course%d' % n, 'offering_unit': '01',
+         'subject': '%03d' % (n // 1000), 'course_number': '%03d' % (n % 1000)}
+        for n in range(courses)))
+
+    insert_batched(Post.__table__, ({
+        'title': 'title%d' % n,
+        'content': '<p>content%d</p>' % n,
+        'search_text': 'title%d content%d' % (n, n),
+        'timestamp': start + timedelta(minutes=n),
+        'last_activity_at': start + timedelta(minutes=n),
+        'due_date': (start + timedelta(days=random.randrange(365))).date(),
+        'is_archived': False,
+        'author_id': 1,
+        'semester_id': 1,
+        'course_id': random.randrange(courses) + 1,
+        'category_id': random.randrange(categories) + 1,
+    } for n in range(posts)))
+
+    insert_batched(Comment.__table__, ({
+        'content': 'comment%d' % n,
+        'timestamp': start + timedelta(minutes=n),
+        'author_id': 1,
+        'post_id': random.randrange(posts) + 1,
+    } for n in range(comments)))
+
+    db.session.commit()
+
+
+def indexes():
+    tables = (Post.__table__, Comment.__table__)
+
+    return [index for table in tables for index in table.indexes
+            if index.name in INDEXES]
+
+
+def foreign_key_indexes():
+    """
+    plain indexes on the foreign keys INDEXES lead with
+    """
+    tables = {'post': Post.__table__, 'comment': Comment.__table__}
+
+    return [Index('ix_bench_{}_{}'.format(table_name, column), tables[table_name].c[column])
+            for table_name, column in FOREIGN_KEYS]
+
+
+def explain(sql, params):
+    if db.engine.dialect.name == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+
+    rows = db.session.execute(text(prefix + sql), params).fetchall()
+
+    return '\n'.join('    ' + ' | '.join(str(v) for v in row) for row in rows)
+
+
+def measure(sql, params, repeat):
+    timings = []
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        db.session.execute(text(sql), params).fetchall()
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+
+    return timings[len(timings) // 2], timings[-1]
+
+
+def report(label, repeat, courses, categories, posts):
+    print('== {}'.format(label))
+
+    for name, sql in QUERIES:
+        params = {
+            'a': random.randrange(min(courses, categories)) + 1,
+            'b': random.randrange(courses) + 1,
+            'c': random.randrange(courses) + 1,
+            'start': date(2018, 3, 1),
+            'end': date(2018, 3, 8),
+        }
+
+        if name == 'comments':
+            params['a'] = random.randrange(posts) + 1
+
+        median, worst = measure(sql, params, repeat)
+
+        print('{}: median {:.3f} ms, max {:.3f} ms'
+              .format(name, median * 1000, worst * 1000))
+        print(explain(sql, params))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--comments', type=int, default=200000)
+    parser.add_argument('--courses', type=int, default=2000)
+    parser.add_argument('--categories', type=int, default=6)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        print('seeding {} posts and {} comments'.format(args.posts, args.comments))
+        seed(args.posts, args.comments, args.courses, args.categories)
+
+        # mysql refuses to drop the only index of a foreign key
+        fk_indexes = foreign_key_indexes()
+
+        for index in fk_indexes:
+            index.create(db.engine)
+
+        for index in indexes():
+            index.drop(db.engine)
+
+        report('without indexes', args.repeat, args.courses, args.categories, args.posts)
+
+        # let the next queries see the new schema
+        db.session.remove()
+
+        for index in indexes():
+            index.create(db.engine)
+
+        for index in fk_indexes:
+            index.drop(db.engine)
+
+        report('with indexes', args.repeat, args.courses, args.categories, args.posts)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+duration, longest transaction and peak memory of deleting a heavy poster,
+loading and changing every row through the orm in one transaction against
+the chunked user_deletion job
+
+    SSAPI_SETTINGS=/path/to/scratch.env python benchmarks/user_deletion.py
+
+the database named by the settings is dropped and recreated
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from ssapi import create_app
+from ssapi.db import db, Category, Comment, Course, Post, Semester, User
+from ssapi.tasks import mail, user_deletion
+
+BATCH_SIZE = 10000
+
+EMAIL = 'heavy@rutgers.edu'
+
+
+def insert_batched(table, rows):
+    batch = []
+
+    for row in rows:
+        batch.append(row)
+
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            batch = []
+
+    if batch:
+        db.session.execute(table.insert(), batch)
+
+
+def seed(posts, comments):
+    db.drop_all()
+    db.create_all()
+
+    start = datetime(2018, 1, 1)
+
+    insert_batched(User.__table__, [
+        {'email': EMAIL, 'password': '42', 'is_verified': True},
+        {'email': 'other@rutgers.edu', 'password': '42', 'is_verified': True},
+    ])
+    insert_batched(Semester.__table__, [{'year': 2018, 'season': 'Fall'}])
+    insert_batched(Category.__table__, [{'name': 'category'}])
+    insert_batched(Course.__table__, [{'name': 'course', 'offering_unit': '01',
+                                       'subject': '198', 'course_number': '111'}])
+
+    # a post of someone else to comment on, then the posts of the user
+    insert_batched(Post.__table__, ({
+        'title': 'title%d' % n,
+        'content': '<p>content%d</p>' % n,
+        'search_text': 'title%d content%d' % (n, n),
+        'timestamp': start + timedelta(minutes=n),
+        'last_activity_at': start + timedelta(minutes=n),
+        'is_archived': False,
+        'author_id': 2 if n == 0 else 1,
+        'semester_id': 1,
+        'course_id': 1,
+        'category_id': 1,
+    } for n in range(posts + 1)))
+
+    insert_batched(Comment.__table__, ({
+        'content': 'comment%d' % n,
+        'timestamp': start + timedelta(minutes=n),
+        'author_id': 1,
+        'post_id': 1,
+    } for n in range(comments)))
+
+    db.session.commit()
+
+
+def orm_deletion(email, remove_content):
+    """
+    every row loaded and changed through the orm, committed at once
+    """
+    user = User.query.filter_by(email=email).one()
+
+    for model in (Post, Comment):
+        for item in model.query.filter_by(author_id=user.id).all():
+            item.author_id = None
+
+            if remove_content:
+                item.is_deleted = True
+                item.deleted_at = datetime.utcnow()
+
+    db.session.delete(user)
+    db.session.commit()
+
+
+def measure(delete):
+    """
+    seconds in all, seconds of the longest transaction and peak mib
+    """
+    transactions = []
+    began = [time.perf_counter()]
+
+    def committed(session):
+        now = time.perf_counter()
+        transactions.append(now - began[0])
+        began[0] = now
+
+    event.listen(db.session, 'after_commit', committed)
+    tracemalloc.start()
+    started = time.perf_counter()
+
+    try:
+        with mail.record_messages():
+            delete(EMAIL, True)
+    finally:
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        event.remove(db.session, 'after_commit', committed)
+
+    return elapsed, max(transactions), peak / 2 ** 20, len(transactions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--comments', type=int, default=100000)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config['USER_DELETION_CHUNK_SIZE'] = args.chunk_size
+
+    with app.app_context():
+        for name, delete in (('orm, one transaction', orm_deletion),
+                             ('chunked job', user_deletion)):
+            print('seeding {} posts and {} comments'.format(args.posts, args.comments))
+            seed(args.posts, args.comments)
+            db.session.remove()
+
+            elapsed, longest, peak, commits = measure(delete)
+
+            assert Comment.query.filter_by(author_id=None, is_deleted=True).count() == \
+                args.comments
+
+            print('{}: {:.2f} s in all, {} commits, longest transaction {:.2f} s, '
+                  'peak {:.1f} MiB'.format(name, elapsed, commits, longest, peak))
+
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
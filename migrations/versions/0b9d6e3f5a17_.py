@@ -0,0 +1,51 @@
+"""course popularity
+
+Revision ID: 0b9d6e3f5a17
+Revises: f2a7c4e91b58
+Create Date: 2026-10-18 15:47:29.805163
+
+"""
+from alembic import op
+from sqlalchemy.sql import table, column, select, func
+from sqlalchemy import Integer
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b9d6e3f5a17'
+down_revision = 'f2a7c4e91b58'
+branch_labels = None
+depends_on = None
+
+courses_table = table('course',
+                      column('id', Integer),
+                      column('popularity', Integer)
+                      )
+
+usercourses_table = table('usercourses',
+                          column('course_id', Integer)
+                          )
+
+posts_table = table('post',
+                    column('id', Integer),
+                    column('course_id', Integer)
+                    )
+
+
+def upgrade():
+    op.add_column('course', sa.Column('popularity', sa.Integer(), nullable=False,
+                                      server_default='0'))
+
+    # the course_popularity job keeps it up to date from here on
+    enrollments = select([func.count()]) \
+        .where(usercourses_table.c.course_id == courses_table.c.id) \
+        .as_scalar()
+    posts = select([func.count(posts_table.c.id)]) \
+        .where(posts_table.c.course_id == courses_table.c.id) \
+        .as_scalar()
+
+    op.execute(courses_table.update().values(popularity=enrollments + posts))
+
+
+def downgrade():
+    op.drop_column('course', 'popularity')
@@ -0,0 +1,63 @@
+"""post last activity
+
+Revision ID: 3f5e1c2a7b90
+Revises: 20fc4cc8abdd
+Create Date: 2026-10-18 10:12:41.118207
+
+"""
+from alembic import op
+from sqlalchemy.sql import table, column, select, func
+from sqlalchemy import Integer, DateTime
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f5e1c2a7b90'
+down_revision = '20fc4cc8abdd'
+branch_labels = None
+depends_on = None
+
+posts_table = table('post',
+                    column('id', Integer),
+                    column('timestamp', DateTime),
+                    column('last_activity_at', DateTime)
+                    )
+
+comments_table = table('comment',
+                       column('post_id', Integer),
+                       column('timestamp', DateTime)
+                       )
+
+
+def upgrade():
+    op.add_column('post', sa.Column('last_activity_at', sa.DateTime(),
+                                    server_default=sa.text('CURRENT_TIMESTAMP'),
+                                    nullable=True))
+
+    # backfill with the newest comment, or the post itself without comments
+    latest_comment = select([func.max(comments_table.c.timestamp)]) \
+        .where(comments_table.c.post_id == posts_table.c.id) \
+        .as_scalar()
+
+    op.execute(
+        posts_table
+        .update()
+        .values(last_activity_at=func.coalesce(latest_comment,
+                                               posts_table.c.timestamp))
+    )
+
+    op.alter_column('post', 'last_activity_at',
+                    existing_type=sa.DateTime(),
+                    existing_server_default=sa.text('CURRENT_TIMESTAMP'),
+                    nullable=False)
+
+    op.create_index(op.f('ix_post_last_activity_at'), 'post',
+                    ['last_activity_at'], unique=False)
+    op.create_index('ix_post_course_id_last_activity_at', 'post',
+                    ['course_id', 'last_activity_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_post_course_id_last_activity_at', table_name='post')
+    op.drop_index(op.f('ix_post_last_activity_at'), table_name='post')
+    op.drop_column('post', 'last_activity_at')
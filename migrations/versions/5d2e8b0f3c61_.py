@@ -0,0 +1,29 @@
+"""post due dates
+
+Revision ID: 5d2e8b0f3c61
+Revises: a81c4d0e5f36
+Create Date: 2026-10-18 11:47:12.503618
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2e8b0f3c61'
+down_revision = 'a81c4d0e5f36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the initial migration predates post due dates, only databases made
+    # with create_all have the column already
+    columns = sa.inspect(op.get_bind()).get_columns('post')
+
+    if 'due_date' not in [c['name'] for c in columns]:
+        op.add_column('post', sa.Column('due_date', sa.Date(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('post', 'due_date')
@@ -0,0 +1,139 @@
+"""post and comment tombstones
+
+Revision ID: 7c1e4f2b9d38
+Revises: 0b9d6e3f5a17
+Create Date: 2026-10-18 18:05:12.442907
+
+"""
+from alembic import op
+from flask import current_app
+from sqlalchemy.sql import table, column, select, func
+from sqlalchemy import Boolean, DateTime, Integer, String, Text
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e4f2b9d38'
+down_revision = '0b9d6e3f5a17'
+branch_labels = None
+depends_on = None
+
+DELETED_CONTENT = '<p>[deleted]</p>'
+
+users_table = table('user',
+                    column('id', Integer),
+                    column('email', String)
+                    )
+
+content_tables = [table(name,
+                        column('content', Text),
+                        column('author_id', Integer),
+                        column('is_deleted', Boolean),
+                        column('deleted_at', DateTime)
+                        ) for name in ('post', 'comment')]
+
+old_indexes = (
+    ('ix_post_timestamp', ['timestamp']),
+    ('ix_post_course_id_timestamp', ['course_id', 'timestamp']),
+    ('ix_post_category_id_timestamp', ['category_id', 'timestamp']),
+    ('ix_post_due_date', ['due_date']),
+    ('ix_post_last_activity_at', ['last_activity_at']),
+    ('ix_post_course_id_last_activity_at', ['course_id', 'last_activity_at']),
+)
+
+new_indexes = (
+    ('ix_post_is_deleted_timestamp', ['is_deleted', 'timestamp']),
+    ('ix_post_course_id_is_deleted_timestamp', ['course_id', 'is_deleted', 'timestamp']),
+    ('ix_post_category_id_is_deleted_timestamp', ['category_id', 'is_deleted', 'timestamp']),
+    ('ix_post_is_deleted_due_date', ['is_deleted', 'due_date']),
+    ('ix_post_is_deleted_last_activity_at', ['is_deleted', 'last_activity_at']),
+    ('ix_post_course_id_is_deleted_last_activity_at',
+     ['course_id', 'is_deleted', 'last_activity_at']),
+)
+
+
+def deleted_account_id(connection):
+    """
+    the id of the account deleted content used to be handed to, if any
+    """
+    email = current_app.config.get('DELETED_ACCOUNT_EMAIL')
+
+    if email is None:
+        return None
+
+    return connection.execute(
+        select([users_table.c.id]).where(users_table.c.email == email)
+    ).scalar()
+
+
+def upgrade():
+    for table_name in ('post', 'comment'):
+        op.add_column(table_name, sa.Column('is_deleted', sa.Boolean(), nullable=False,
+                                            server_default=sa.false()))
+        op.add_column(table_name, sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        op.alter_column(table_name, 'author_id',
+                        existing_type=sa.Integer(),
+                        nullable=True)
+
+    # content deleted so far was overwritten with the placeholder and handed
+    # to the deleted account
+    connection = op.get_bind()
+    deleted_id = deleted_account_id(connection)
+
+    for content_table in content_tables:
+        connection.execute(
+            content_table
+            .update()
+            .where(content_table.c.content == DELETED_CONTENT)
+            .values(is_deleted=True, deleted_at=func.now())
+        )
+
+        if deleted_id is not None:
+            connection.execute(
+                content_table
+                .update()
+                .where(content_table.c.author_id == deleted_id)
+                .values(author_id=None)
+            )
+
+    # the new indexes lead with the foreign keys of the old ones, create them
+    # first so mysql always has an index for the constraints
+    for name, columns in new_indexes:
+        op.create_index(name, 'post', columns, unique=False)
+
+    for name, columns in old_indexes:
+        op.drop_index(name, table_name='post')
+
+
+def downgrade():
+    for name, columns in old_indexes:
+        op.create_index(name, 'post', columns, unique=False)
+
+    for name, columns in new_indexes:
+        op.drop_index(name, table_name='post')
+
+    # back to the deleted account, which has to exist for authors to be
+    # required again
+    connection = op.get_bind()
+    deleted_id = deleted_account_id(connection)
+
+    for content_table in content_tables:
+        connection.execute(
+            content_table
+            .update()
+            .where(content_table.c.is_deleted == sa.true())
+            .values(content=DELETED_CONTENT, author_id=deleted_id)
+        )
+        connection.execute(
+            content_table
+            .update()
+            .where(content_table.c.author_id.is_(None))
+            .values(author_id=deleted_id)
+        )
+
+    for table_name in ('post', 'comment'):
+        op.alter_column(table_name, 'author_id',
+                        existing_type=sa.Integer(),
+                        nullable=False)
+        op.drop_column(table_name, 'deleted_at')
+        op.drop_column(table_name, 'is_deleted')
@@ -0,0 +1,78 @@
+"""post full-text search
+
+Revision ID: a81c4d0e5f36
+Revises: 3f5e1c2a7b90
+Create Date: 2026-10-18 11:02:17.540611
+
+"""
+from alembic import op
+from html import unescape
+from sqlalchemy.sql import table, column, select, bindparam
+from sqlalchemy import Integer, Text
+import bleach
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a81c4d0e5f36'
+down_revision = '3f5e1c2a7b90'
+branch_labels = None
+depends_on = None
+
+posts_table = table('post',
+                    column('id', Integer),
+                    column('title', Text),
+                    column('content', Text),
+                    column('search_text', Text)
+                    )
+
+batch_size = 1000
+
+
+def plain_text(html):
+    return unescape(bleach.clean(html, tags=[], strip=True))
+
+
+def upgrade():
+    op.add_column('post', sa.Column('search_text', sa.Text(), nullable=True))
+
+    # backfill in batches of markup free title and content
+    connection = op.get_bind()
+    last_id = 0
+
+    while True:
+        rows = connection.execute(
+            select([posts_table.c.id, posts_table.c.title, posts_table.c.content])
+            .where(posts_table.c.id > last_id)
+            .order_by(posts_table.c.id)
+            .limit(batch_size)
+        ).fetchall()
+
+        if not rows:
+            break
+
+        connection.execute(
+            posts_table
+            .update()
+            .where(posts_table.c.id == bindparam('_id'))
+            .values(search_text=bindparam('search_text')),
+            [{'_id': id, 'search_text': '{} {}'.format(title, plain_text(content))}
+             for id, title, content in rows]
+        )
+
+        last_id = rows[-1][0]
+
+    op.alter_column('post', 'search_text',
+                    existing_type=sa.Text(),
+                    nullable=False)
+
+    if connection.dialect.name == 'mysql':
+        op.create_index('ix_post_search_text', 'post', ['search_text'],
+                        unique=False, mysql_prefix='FULLTEXT')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'mysql':
+        op.drop_index('ix_post_search_text', table_name='post')
+
+    op.drop_column('post', 'search_text')
@@ -0,0 +1,33 @@
+"""post filter indexes
+
+Revision ID: c2d7e9b14a05
+Revises: 5d2e8b0f3c61
+Create Date: 2026-10-18 11:48:03.902754
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2d7e9b14a05'
+down_revision = '5d2e8b0f3c61'
+branch_labels = None
+depends_on = None
+
+indexes = (
+    ('ix_post_timestamp', 'post', ['timestamp']),
+    ('ix_post_course_id_timestamp', 'post', ['course_id', 'timestamp']),
+    ('ix_post_category_id_timestamp', 'post', ['category_id', 'timestamp']),
+    ('ix_post_due_date', 'post', ['due_date']),
+    ('ix_comment_post_id_timestamp', 'comment', ['post_id', 'timestamp']),
+)
+
+
+def upgrade():
+    for name, table_name, columns in indexes:
+        op.create_index(name, table_name, columns, unique=False)
+
+
+def downgrade():
+    for name, table_name, columns in reversed(indexes):
+        op.drop_index(name, table_name=table_name)
@@ -0,0 +1,100 @@
+"""unique course codes
+
+Revision ID: e5b3a9c6d271
+Revises: c2d7e9b14a05
+Create Date: 2026-10-18 14:21:40.117382
+
+"""
+from alembic import op
+from sqlalchemy.sql import table, column, select, func
+from sqlalchemy import Integer, String
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b3a9c6d271'
+down_revision = 'c2d7e9b14a05'
+branch_labels = None
+depends_on = None
+
+courses_table = table('course',
+                      column('id', Integer),
+                      column('offering_unit', String),
+                      column('subject', String),
+                      column('course_number', String)
+                      )
+
+posts_table = table('post',
+                    column('course_id', Integer)
+                    )
+
+usercourses_table = table('usercourses',
+                          column('user_id', Integer),
+                          column('course_id', Integer)
+                          )
+
+
+def upgrade():
+    # the term 7 catalogs list graduate courses once per campus, merge each
+    # code into its first course before making codes unique
+    connection = op.get_bind()
+    code = (courses_table.c.offering_unit, courses_table.c.subject,
+            courses_table.c.course_number)
+
+    duplicated = connection.execute(
+        select(list(code) + [func.min(courses_table.c.id)])
+        .group_by(*code)
+        .having(func.count(courses_table.c.id) > 1)
+    ).fetchall()
+
+    for offering_unit, subject, course_number, keep_id in duplicated:
+        ids = [id for id, in connection.execute(
+            select([courses_table.c.id])
+            .where(courses_table.c.offering_unit == offering_unit)
+            .where(courses_table.c.subject == subject)
+            .where(courses_table.c.course_number == course_number)
+            .where(courses_table.c.id != keep_id)
+        )]
+
+        connection.execute(
+            posts_table
+            .update()
+            .where(posts_table.c.course_id.in_(ids))
+            .values(course_id=keep_id)
+        )
+
+        # users keep the course once, however many of its duplicates they had
+        user_ids = {user_id for user_id, in connection.execute(
+            select([usercourses_table.c.user_id])
+            .where(usercourses_table.c.course_id.in_(ids + [keep_id]))
+        )}
+        kept_user_ids = {user_id for user_id, in connection.execute(
+            select([usercourses_table.c.user_id])
+            .where(usercourses_table.c.course_id == keep_id)
+        )}
+
+        connection.execute(
+            usercourses_table
+            .delete()
+            .where(usercourses_table.c.course_id.in_(ids))
+        )
+
+        if user_ids - kept_user_ids:
+            connection.execute(
+                usercourses_table.insert(),
+                [{'user_id': user_id, 'course_id': keep_id}
+                 for user_id in sorted(user_ids - kept_user_ids)]
+            )
+
+        connection.execute(
+            courses_table
+            .delete()
+            .where(courses_table.c.id.in_(ids))
+        )
+
+    op.create_index('ix_course_offering_unit_subject_course_number', 'course',
+                    ['offering_unit', 'subject', 'course_number'], unique=True)
+
+
+def downgrade():
+    # merged duplicates are not restored
+    op.drop_index('ix_course_offering_unit_subject_course_number', table_name='course')
@@ -0,0 +1,25 @@
+"""retired courses
+
+Revision ID: f2a7c4e91b58
+Revises: e5b3a9c6d271
+Create Date: 2026-10-18 15:02:11.463018
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a7c4e91b58'
+down_revision = 'e5b3a9c6d271'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('course', sa.Column('is_retired', sa.Boolean(), nullable=False,
+                                      server_default=sa.false()))
+
+
+def downgrade():
+    op.drop_column('course', 'is_retired')
@@ -6,6 +6,9 @@ sleep 5;
 # initialize the database
 flask db upgrade
 
+# register periodic jobs, run by the scheduler service
+flask schedule-jobs
+
 # add test data
 if [ -z "$E2E" ]; then
    flask seed_test_data
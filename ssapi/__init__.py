@@ -33,6 +33,18 @@ def create_app(test_config=None):
     from . import db
     db.init_app(app)
 
+    from .cache import init_app as cache_init_app
+    cache_init_app(app)
+
+    from .catalog import init_app as catalog_init_app
+    catalog_init_app(app)
+
+    from .reference import init_app as reference_init_app
+    reference_init_app(app)
+
+    from .identity import init_app as identity_init_app
+    identity_init_app(app)
+
     import ssapi.apis as api
     api.init_app(app)
 
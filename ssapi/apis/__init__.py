@@ -7,6 +7,9 @@ from .post import api as ns3
 from .semester import api as ns4
 from .user import api as ns5
 from .comment import api as ns6
+from .metrics import api as ns7
+from .bootstrap import api as ns8
+from .job import api as ns9
 
 authorizations = {
     'apikey': {
@@ -30,6 +33,9 @@ api.add_namespace(ns3)
 api.add_namespace(ns4)
 api.add_namespace(ns5)
 api.add_namespace(ns6)
+api.add_namespace(ns7)
+api.add_namespace(ns8)
+api.add_namespace(ns9)
 
 
 def init_app(app):
@@ -0,0 +1,47 @@
+from collections import OrderedDict
+from flask import abort
+from flask_restplus import fields, reqparse
+
+# ids per batch request
+MAX_IDS = 100
+
+
+def batch_parser(name):
+    parser = reqparse.RequestParser()
+
+    parser.add_argument('ids[]',
+                        type=int,
+                        action='append',
+                        required=True,
+                        location='args',
+                        help='The {} ids, at most {}'.format(name, MAX_IDS))
+
+    return parser
+
+
+def batch_model(api, name, model):
+    return api.model('{} Batch'.format(name), {
+        'items': fields.List(fields.Nested(model),
+                             description='The found {}s, in the order asked for'.format(name.lower())),
+        'missing': fields.List(fields.Integer,
+                               description='The ids asked for that were not found')
+    })
+
+
+def fetch_batch(query, column, ids):
+    """
+    the rows of query with column in ids, in the order of ids, from one IN
+    query, and the ids not found
+    """
+    # the first of repeated ids counts
+    ids = list(OrderedDict.fromkeys(ids))
+
+    if len(ids) > MAX_IDS:
+        return abort(400, 'At most {} ids per request'.format(MAX_IDS))
+
+    found = {getattr(row, column.key): row for row in query.filter(column.in_(ids))}
+
+    return {
+        'items': [found[id] for id in ids if id in found],
+        'missing': [id for id in ids if id not in found]
+    }
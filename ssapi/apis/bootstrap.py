@@ -0,0 +1,58 @@
+from flask_praetorian import auth_required
+from flask_restplus import Namespace, Resource, fields, marshal
+from ssapi.cache import cache
+from ssapi.reference import reference
+
+from .category import category_marshal_model
+from .conditional import content_tag, etag
+from .course import course_marshal_model
+from .post import get_posts_parser, paginated_post_marshal_model, \
+    cached_posts, dependencies, posts_params
+from .semester import semester_marshal_model
+from .user import cached_user_courses, courses_version
+
+api = Namespace('bootstrap', description='Everything the app needs on start-up')
+
+bootstrap_marshal_model = api.model('Bootstrap', {
+    'categories': fields.List(fields.Nested(category_marshal_model)),
+    'semesters': fields.List(fields.Nested(semester_marshal_model), description='Latest first'),
+    'courses': fields.List(fields.Nested(course_marshal_model),
+                           description='The courses of the current user'),
+    'posts': fields.Nested(paginated_post_marshal_model,
+                           description='The first page of posts, as GET /posts/ with the '
+                                       'same arguments would return it')
+})
+
+
+def version(self):
+    """
+    changes with anything in the response, without reading any of it
+    """
+    args = get_posts_parser.parse_args()
+    tag = cache.tag('catalog', courses_version(), *dependencies(args))
+    # this process may still serve reference data older than redis has
+    reference_version = reference.version
+
+    if tag is None or reference_version is None:
+        return None
+
+    return content_tag([tag, reference_version, posts_params(args)])
+
+
+@api.route('/')
+class BootstrapResource(Resource):
+    @api.doc('bootstrap')
+    @api.expect(get_posts_parser)
+    @api.response(200, 'Success', bootstrap_marshal_model)
+    @api.response(304, 'Not modified since the If-None-Match etag')
+    @auth_required
+    @etag(version)
+    def get(self):
+        args = get_posts_parser.parse_args()
+
+        return {
+            'categories': marshal(reference.categories(), category_marshal_model),
+            'semesters': marshal(reference.semesters(), semester_marshal_model),
+            'courses': cached_user_courses(),
+            'posts': cached_posts(args)
+        }
@@ -1,6 +1,8 @@
 from flask_praetorian import auth_required
 from flask_restplus import Namespace, Resource, fields
-from ssapi.db import Category
+from ssapi.reference import reference
+
+from .conditional import etag
 
 api = Namespace('categories', description='Category related operations')
 
@@ -13,7 +15,9 @@ category_marshal_model = api.model('Category', {
 @api.route('/')
 class CategoryListResource(Resource):
     @api.doc('list_categories')
-    @api.marshal_list_with(category_marshal_model)
+    @api.response(304, 'Not modified since the If-None-Match etag')
     @auth_required
+    @etag()
+    @api.marshal_list_with(category_marshal_model)
     def get(self):
-        return Category.query.all()
+        return reference.categories()
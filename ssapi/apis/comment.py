@@ -4,15 +4,35 @@ from .user import basic_user_marshal_model
 
 api = Namespace('comments', description='Comment related operations')
 
+DELETED_CONTENT = '<p>[deleted]</p>'
+
+DELETED_AUTHOR = {'email': '[deleted]'}
+
+
+def unless_deleted(name, placeholder):
+    """
+    attribute getter for fields of posts and comments, placeholder for
+    deleted ones and missing values
+    """
+    def get(obj):
+        value = getattr(obj, name, None)
+
+        return placeholder if getattr(obj, 'is_deleted', False) or value is None else value
+
+    return get
+
+
 comment_marshal_model = api.model('Comment', {
     'id': fields.String(required=True,
                         description='The comment id'),
     'content': fields.String(required=True,
+                             attribute=unless_deleted('content', DELETED_CONTENT),
                              description='The comment content'),
     'timestamp': fields.String(required=True,
                                description='The comment timestamp'),
     'author': fields.Nested(model=basic_user_marshal_model,
                             required=True,
+                            attribute=unless_deleted('author', DELETED_AUTHOR),
                             description='Comment author'),
 })
 
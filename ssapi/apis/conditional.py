@@ -0,0 +1,53 @@
+import hashlib
+import json
+from functools import wraps
+from flask import request, Response
+from flask_restplus.utils import unpack
+from werkzeug.http import quote_etag
+
+
+def content_tag(data):
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def not_modified(tag):
+    return Response(status=304, headers={'ETag': quote_etag(tag)})
+
+
+def etag(version=None):
+    """
+    strong etags and conditional GET for a view
+
+    with version, the etag is version(*args, **kwargs) and a matching
+    If-None-Match is answered before the view runs, version may return None
+    to fall back to hashing the response, which still saves the transfer
+
+    place it inside auth_required and outside marshal_with
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            tag = version(*args, **kwargs) if version is not None else None
+
+            if tag is not None and request.if_none_match.contains_weak(tag):
+                return not_modified(tag)
+
+            data, code, headers = unpack(f(*args, **kwargs))
+
+            if code != 200:
+                return data, code, headers
+
+            if tag is None:
+                tag = content_tag(data)
+
+                if request.if_none_match.contains_weak(tag):
+                    return not_modified(tag)
+
+            headers = dict(headers or {})
+            headers['ETag'] = quote_etag(tag)
+
+            return data, code, headers
+
+        return wrapper
+
+    return decorator
@@ -1,9 +1,12 @@
 import re
 from flask_praetorian import auth_required
 from flask_restplus import Namespace, Resource, fields, reqparse
-from sqlalchemy import asc
+from ssapi.catalog import catalog
 from ssapi.db import Course
 
+from .batch import batch_model, batch_parser, fetch_batch
+from .conditional import etag
+
 
 api = Namespace('courses', description='Course related operations')
 
@@ -12,13 +15,28 @@ parser = reqparse.RequestParser()
 parser.add_argument('query',
                     type=str,
                     location='args',
-                    help='Search for courses containing query in name')
+                    help='Search for courses containing query in name, or by '
+                         'course code, complete or partial like 21:640')
 parser.add_argument('limit',
                     type=int,
                     default=10,
                     location='args',
                     help='Limit number of returned results')
 
+autocomplete_parser = reqparse.RequestParser()
+
+autocomplete_parser.add_argument('query',
+                                 type=str,
+                                 required=True,
+                                 location='args',
+                                 help='Beginning of a course name, of a word in it, '
+                                      'or of a course code like 21:640')
+autocomplete_parser.add_argument('limit',
+                                 type=int,
+                                 default=10,
+                                 location='args',
+                                 help='Limit number of returned results, at most 25')
+
 course_marshal_model = api.model('Course', {
     'id': fields.String(required=True, description='The course id'),
     'name': fields.String(required=True, description='The course name'),
@@ -29,6 +47,32 @@ course_marshal_model = api.model('Course', {
 })
 
 
+course_batch_marshal_model = batch_model(api, 'Course', course_marshal_model)
+
+course_batch_parser = batch_parser('course')
+
+AUTOCOMPLETE_MAX_LIMIT = 25
+
+# complete course codes, or their leading parts, like 21:640:135 or 21:640
+COURSE_CODE = re.compile(r'(\d{1,2}):(\d{1,3})(?::(\d{1,3}))?$')
+
+
+def code_search(code, limit):
+    """
+    courses by code, the given parts of the code are equality matches on
+    the leading columns of the unique course code index
+    """
+    columns = (Course.offering_unit, Course.subject, Course.course_number)
+    filters = [column == part for column, part in zip(columns, code) if part is not None]
+    filters.append(Course.is_retired.is_(False))
+
+    return Course.query \
+        .filter(*filters) \
+        .order_by(*columns) \
+        .limit(limit) \
+        .all()
+
+
 @api.route('/')
 class CourseListResource(Resource):
     @api.doc('list_courses')
@@ -37,34 +81,53 @@ class CourseListResource(Resource):
     @auth_required
     def get(self):
         args = parser.parse_args()
-        filters = []
 
-        # courses are sorted by name by default
-        order_by = asc(Course.name)
+        # set with default
+        limit = args['limit']
 
         if args['query'] is not None:
-            result = re.match(r'(\d{1,2}):(\d{1,3}):(\d{1,3})', args['query'])
+            code = COURSE_CODE.match(args['query'])
 
-            if result:
-                offering_unit, subject, course_number = result.group(1, 2, 3)
+            if code:
+                return code_search(code.group(1, 2, 3), limit)
 
-                filters.append(Course.course_number.like(course_number))
-                filters.append(Course.offering_unit.like(offering_unit))
-                filters.append(Course.subject.like(subject))
-            else:
-                filters.append(Course.name.like('%{}%'.format(args['query'])))
+        # names are searched in the in memory index, sorted by name
+        return catalog.index.search(args['query'] or '', limit)
 
-        # set with default
-        limit = args['limit']
 
-        return Course.query.filter(*filters).order_by(order_by).limit(limit).all()
+@api.route('/autocomplete')
+class CourseAutocompleteResource(Resource):
+    @api.doc('autocomplete_courses')
+    @api.expect(autocomplete_parser)
+    @api.marshal_list_with(course_marshal_model)
+    @auth_required
+    def get(self):
+        args = autocomplete_parser.parse_args()
+
+        limit = max(0, min(args['limit'], AUTOCOMPLETE_MAX_LIMIT))
+
+        return catalog.index.autocomplete(args['query'], limit)
+
+
+@api.route('/batch')
+class CourseBatchResource(Resource):
+    @api.doc('get_many_courses')
+    @api.expect(course_batch_parser)
+    @api.marshal_with(course_batch_marshal_model)
+    @auth_required
+    def get(self):
+        args = course_batch_parser.parse_args()
+
+        return fetch_batch(Course.query, Course.id, args['ids[]'])
 
 
 @api.route('/<int:id>')
 @api.param('id', 'The course id')
 class CourseResource(Resource):
     @api.doc('get_one_course')
-    @api.marshal_with(course_marshal_model)
+    @api.response(304, 'Not modified since the If-None-Match etag')
     @auth_required
+    @etag()
+    @api.marshal_with(course_marshal_model)
     def get(self, id):
         return Course.query.get_or_404(id)
@@ -0,0 +1,48 @@
+from flask import abort
+from flask_praetorian import auth_required, current_user_id
+from flask_restplus import Namespace, Resource, fields
+from rq.exceptions import NoSuchJobError
+from rq.job import Job
+from ssapi.tasks import rq
+
+api = Namespace('jobs', description='Background job operations')
+
+job_marshal_model = api.model('Job', {
+    'id': fields.String(required=True, description='The job id'),
+    'status': fields.String(required=True,
+                            description='One of queued, started, deferred, finished or failed'),
+    'progress': fields.Raw(description='How far the job has come, as the job reports it'),
+    'enqueued_at': fields.DateTime(description='When the job was queued'),
+    'started_at': fields.DateTime(description='When a worker started the job'),
+    'ended_at': fields.DateTime(description='When the job finished or failed'),
+})
+
+
+@api.route('/<string:id>')
+@api.param('id', 'The job id')
+class JobResource(Resource):
+    @api.doc('get_job')
+    @api.response(404, 'No such job of the current user')
+    @api.marshal_with(job_marshal_model)
+    @auth_required
+    def get(self, id):
+        """
+        status and progress of a job queued for the current user
+        """
+        try:
+            job = Job.fetch(id, connection=rq.connection)
+        except NoSuchJobError:
+            return abort(404)
+
+        # someone else's job is as good as missing
+        if job.meta.get('owner') != current_user_id():
+            return abort(404)
+
+        return {
+            'id': job.id,
+            'status': job.get_status(),
+            'progress': job.meta.get('progress'),
+            'enqueued_at': job.enqueued_at,
+            'started_at': job.started_at,
+            'ended_at': job.ended_at,
+        }
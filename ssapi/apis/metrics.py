@@ -0,0 +1,58 @@
+from datetime import datetime
+from flask import current_app
+from flask_praetorian import auth_required
+from flask_restplus import Namespace, Resource, fields
+from ssapi.cache import cache
+from ssapi.tasks import rq
+
+api = Namespace('metrics', description='Operational metrics')
+
+cache_stats_marshal_model = api.model('Cache Stats', {
+    'hits': fields.Integer(required=True,
+                           description='Responses served from the cache'),
+    'misses': fields.Integer(required=True,
+                             description='Responses computed and then cached'),
+})
+
+queue_stats_marshal_model = api.model('Queue Stats', {
+    'name': fields.String(required=True,
+                          description='The queue name'),
+    'depth': fields.Integer(required=True,
+                            description='Jobs waiting in the queue'),
+    'latency': fields.Float(required=True,
+                            description='Seconds the oldest waiting job has waited'),
+})
+
+
+def queue_stats(name):
+    queue = rq.get_queue(name)
+    latency = 0.0
+
+    for job_id in queue.get_job_ids(0, 1):
+        job = queue.fetch_job(job_id)
+
+        if job is not None and job.enqueued_at is not None:
+            latency = max((datetime.utcnow() - job.enqueued_at).total_seconds(), 0.0)
+
+    return {'name': name, 'depth': queue.count, 'latency': latency}
+
+
+@api.route('/cache')
+class CacheStatsResource(Resource):
+    @api.doc('get_cache_stats')
+    @api.marshal_with(cache_stats_marshal_model)
+    @auth_required
+    def get(self):
+        return cache.stats()
+
+
+@api.route('/queues')
+class QueueStatsResource(Resource):
+    @api.doc('get_queue_stats')
+    @api.marshal_list_with(queue_stats_marshal_model)
+    @auth_required
+    def get(self):
+        """
+        the job queues, highest priority first
+        """
+        return [queue_stats(name) for name in current_app.config['RQ_QUEUES']]
@@ -1,14 +1,31 @@
 import bleach
+import binascii
+import hashlib
+import json
+import time
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from flask import abort, request, current_app
-from flask_praetorian import auth_required, current_user
-from flask_restplus import Namespace, Resource, fields, reqparse, marshal
-from sqlalchemy import desc, or_
-
-from ssapi.db import db, Post, Course, Category, Semester, Comment, User
-
+from flask_praetorian import auth_required, current_user, current_user_id
+from flask_restplus import Namespace, Resource, fields, inputs, reqparse, marshal
+from redis import RedisError
+from sqlalchemy import and_, case, desc, func, literal, or_, text
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.sql import expression
+
+from ssapi.cache import cache
+from ssapi.db import db, plain_text, tombstone, userpostcheers, \
+    Post, Course, Comment
+from ssapi.identity import current_identity
+from ssapi.reference import reference
+from ssapi.tasks import post_total
+
+from .batch import batch_model, batch_parser, fetch_batch
 from .category import category_marshal_model
-from .comment import comment_marshal_model, new_comment_marshal_model
+from .comment import comment_marshal_model, new_comment_marshal_model, \
+    unless_deleted, DELETED_AUTHOR, DELETED_CONTENT
+from .conditional import etag
 from .course import course_marshal_model
 from .semester import semester_marshal_model
 from .user import basic_user_marshal_model
@@ -18,27 +35,46 @@ api = Namespace('posts', description='Post related operations')
 get_posts_parser = reqparse.RequestParser()
 
 get_posts_parser.add_argument('courses[]',
+                              type=int,
                               action='append',
                               location='args',
                               help='Filter posts by specifying course ids')
 get_posts_parser.add_argument('categories[]',
+                              type=int,
                               action='append',
                               location='args',
                               help='Filter posts by specifying category ids')
 get_posts_parser.add_argument('query',
                               type=str,
                               location='args',
-                              help='Search for posts containing query in content')
+                              help='Full-text search of post titles and content')
 get_posts_parser.add_argument('page',
                               type=int,
                               default=1,
                               location='args',
                               help='Pagination')
+get_posts_parser.add_argument('cursor',
+                              type=str,
+                              location='args',
+                              help='Keyset pagination, pass the next_cursor of '
+                                   'the previous page instead of a page number')
 get_posts_parser.add_argument('sort',
-                              choices=('time', 'activity'),
+                              choices=('time', 'activity', 'relevance'),
                               default='time',
                               location='args',
-                              help='Sort by time or latest activity')
+                              help='Sort by time, latest activity or search relevance')
+get_posts_parser.add_argument('view',
+                              choices=('full', 'summary'),
+                              default='full',
+                              location='args',
+                              help='Full posts, or summaries with counts instead '
+                                   'of comments and cheers')
+get_posts_parser.add_argument('with_total',
+                              choices=('true', 'false', 'approximate'),
+                              default='true',
+                              location='args',
+                              help='Count the matching posts, skip counting, or '
+                                   'use a periodically refreshed count')
 get_posts_parser.add_argument('start_date',
                               location='args',
                               help='Return posts on or after given date')
@@ -46,6 +82,32 @@ get_posts_parser.add_argument('end_date',
                               location='args',
                               help='Return posts before and not on given date')
 
+calendar_parser = reqparse.RequestParser()
+
+calendar_parser.add_argument('courses[]',
+                             type=int,
+                             action='append',
+                             location='args',
+                             help='Count posts of the given course ids')
+calendar_parser.add_argument('categories[]',
+                             type=int,
+                             action='append',
+                             location='args',
+                             help='Count posts of the given category ids')
+calendar_parser.add_argument('start_date',
+                             required=True,
+                             location='args',
+                             help='First day of the calendar')
+calendar_parser.add_argument('end_date',
+                             required=True,
+                             location='args',
+                             help='Day after the last day of the calendar')
+calendar_parser.add_argument('ids',
+                             type=inputs.boolean,
+                             default=False,
+                             location='args',
+                             help='Also list the post ids due on each day')
+
 new_post_marshal_model = api.model('New Post Model', {
     'title': fields.String(required=True, description='Post title'),
     'content': fields.String(required=True, description='Post content'),
@@ -62,6 +124,7 @@ post_marshal_model = api.model('Post', {
     'due_date': fields.Date(required=False,
                             description='The post due date, if it makes sense'),
     'content': fields.String(required=True,
+                             attribute=unless_deleted('content', DELETED_CONTENT),
                              description='The post content'),
     'cheers': fields.Nested(model=basic_user_marshal_model,
                             required=True,
@@ -83,14 +146,543 @@ post_marshal_model = api.model('Post', {
                               description='Post semester'),
     'author': fields.Nested(model=basic_user_marshal_model,
                             required=True,
+                            attribute=unless_deleted('author', DELETED_AUTHOR),
                             description='Post author'),
 })
 
 paginated_post_marshal_model = api.model('Paginated Post', {
     'items': fields.List(fields.Nested(post_marshal_model)),
-    'total': fields.Integer()
+    'total': fields.Integer(description='Omitted when paging by cursor or '
+                                        'with_total=false'),
+    'next_cursor': fields.String(description='Cursor for the next page, if any')
 })
 
+post_summary_marshal_model = api.model('Post Summary', {
+    'id': fields.String(required=True,
+                        description='The post id'),
+    'title': fields.String(required=True,
+                           description='The post title'),
+    'due_date': fields.Date(required=False,
+                            description='The post due date, if it makes sense'),
+    'excerpt': fields.String(required=True,
+                             description='Beginning of the post content, as plain text'),
+    'cheer_count': fields.Integer(required=True,
+                                  description='Number of cheers'),
+    'cheered': fields.Boolean(required=True,
+                              description='Whether the current user cheered the post'),
+    'comment_count': fields.Integer(required=True,
+                                    description='Number of comments'),
+    'timestamp': fields.DateTime(required=True,
+                                 description='Creation timestamp'),
+    'is_archived': fields.Boolean(required=True,
+                                  description='Whether post can be commented on'),
+    'category': fields.Nested(model=category_marshal_model,
+                              description='Post category'),
+    'course': fields.Nested(model=course_marshal_model,
+                            required=True,
+                            description='Course to which post belongs'),
+    'semester': fields.Nested(model=semester_marshal_model,
+                              required=True,
+                              description='Post semester'),
+    'author': fields.Nested(model=basic_user_marshal_model,
+                            required=True,
+                            default=DELETED_AUTHOR,
+                            description='Post author'),
+})
+
+paginated_post_summary_marshal_model = api.model('Paginated Post Summary', {
+    'items': fields.List(fields.Nested(post_summary_marshal_model)),
+    'total': fields.Integer(description='Omitted when paging by cursor or '
+                                        'with_total=false'),
+    'next_cursor': fields.String(description='Cursor for the next page, if any')
+})
+
+calendar_day_marshal_model = api.model('Calendar Day', {
+    'date': fields.Date(required=True, description='The due date'),
+    'count': fields.Integer(required=True, description='Number of posts due'),
+    'posts': fields.List(fields.Integer,
+                         description='Ids of the posts due, if asked for'),
+})
+
+post_batch_marshal_model = batch_model(api, 'Post', post_marshal_model)
+
+post_batch_parser = batch_parser('post')
+
+POSTS_PER_PAGE = 20
+
+CALENDAR_MAX_DAYS = 366
+
+EXCERPT_LENGTH = 200
+
+CURSOR_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+# approximate totals are refreshed in the background once they are older
+# than the interval, and dropped once nobody asked for them for a day
+TOTAL_REFRESH_INTERVAL = 60
+
+TOTAL_TIMEOUT = 24 * 60 * 60
+
+TOTAL_ARGS = ('courses[]', 'categories[]', 'query', 'start_date', 'end_date')
+
+# innodb_ft_min_token_size, shorter words are not in the FULLTEXT index
+FULLTEXT_MIN_TOKEN_SIZE = 3
+
+
+def post_query():
+    """
+    posts with everything post_marshal_model touches loaded up front,
+    one query for the posts and their single valued relationships and
+    one each for cheers and for comments with their authors
+    """
+    return Post.query.options(
+        joinedload(Post.author),
+        joinedload(Post.course),
+        joinedload(Post.semester),
+        joinedload(Post.category),
+        selectinload(Post.cheers),
+        selectinload(Post.comments).joinedload(Comment.author)
+    )
+
+
+def summary_query():
+    """
+    posts with only the single valued relationships of
+    post_summary_marshal_model loaded up front
+    """
+    return Post.query.options(
+        joinedload(Post.author),
+        joinedload(Post.course),
+        joinedload(Post.semester),
+        joinedload(Post.category)
+    )
+
+
+def excerpt(html):
+    text = ' '.join(plain_text(html).split())
+
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+
+    # cut at the last whole word
+    return text[:EXCERPT_LENGTH].rsplit(' ', 1)[0] + '\u2026'
+
+
+def summarize(posts, user):
+    """
+    post summaries, counting comments and cheers for the whole page with
+    one grouped query each
+    """
+    ids = [post.id for post in posts]
+    comment_counts = {}
+    cheer_counts = {}
+
+    if ids:
+        comment_counts = dict(
+            db.session.query(Comment.post_id, func.count(Comment.id))
+            .filter(Comment.post_id.in_(ids))
+            .group_by(Comment.post_id)
+        )
+
+        cheered_by_user = func.sum(
+            case([(userpostcheers.c.user_id == user.id, 1)], else_=0))
+
+        cheer_counts = {
+            post_id: (count, cheered)
+            for post_id, count, cheered in
+            db.session.query(userpostcheers.c.post_id,
+                             func.count(userpostcheers.c.user_id),
+                             cheered_by_user)
+            .filter(userpostcheers.c.post_id.in_(ids))
+            .group_by(userpostcheers.c.post_id)
+        }
+
+    summaries = []
+
+    for post in posts:
+        cheer_count, cheered = cheer_counts.get(post.id, (0, 0))
+
+        summaries.append({
+            'id': post.id,
+            'title': post.title,
+            'due_date': post.due_date,
+            'excerpt': excerpt(post.content),
+            'cheer_count': cheer_count,
+            'cheered': bool(cheered),
+            'comment_count': comment_counts.get(post.id, 0),
+            'timestamp': post.timestamp,
+            'is_archived': post.is_archived,
+            'category': post.category,
+            'course': post.course,
+            'semester': post.semester,
+            'author': post.author,
+        })
+
+    return summaries
+
+
+def search(query):
+    """
+    returns the filter and relevance expressions for a full-text search
+
+    mysql uses the FULLTEXT index on search_text in natural language mode,
+    which matches posts with any of the words, other databases (and
+    queries made only of words too short to be indexed) fall back to
+    matching every word with LIKE and scoring by occurrences, with
+    matches in the title counting extra, so there a post needs all of the
+    words
+    """
+    terms = query.split()
+
+    if db.engine.dialect.name == 'mysql' and \
+            any(len(term) >= FULLTEXT_MIN_TOKEN_SIZE for term in terms):
+        match = text('MATCH (post.search_text) '
+                     'AGAINST (:query IN NATURAL LANGUAGE MODE)') \
+            .bindparams(query=query)
+
+        return match, match
+
+    filters = []
+    relevance = literal(0)
+    search_text = func.lower(Post.search_text)
+
+    for term in terms:
+        filters.append(Post.search_text.contains(term, autoescape=True))
+
+        occurrences = (func.length(search_text) -
+                       func.length(func.replace(search_text, term.lower(), ''))) \
+            / len(term)
+        in_title = case([(Post.title.contains(term, autoescape=True), 2)],
+                        else_=0)
+
+        relevance = relevance + occurrences + in_title
+
+    return and_(*filters), relevance
+
+
+def sort_key_column(sort):
+    """
+    the column posts are ordered by (descending), ties are broken by post id
+    """
+    if sort == 'activity':
+        return Post.last_activity_at
+
+    return Post.timestamp
+
+
+def sort_key(post, sort):
+    """
+    python side equivalent of sort_key_column for an already loaded post
+    """
+    if sort == 'activity':
+        return post.last_activity_at
+
+    return post.timestamp
+
+
+def encode_cursor(post, sort):
+    key = sort_key(post, sort).strftime(CURSOR_TIMESTAMP_FORMAT)
+    raw = json.dumps([key, post.id]).encode('utf-8')
+
+    return urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        key, id = json.loads(urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        return datetime.strptime(key, CURSOR_TIMESTAMP_FORMAT), int(id)
+    except (binascii.Error, TypeError, ValueError):
+        return abort(400, 'Invalid cursor')
+
+
+def cache_params(args, **extra):
+    """
+    args and extra as a cache key, in which the order of ids does not matter
+    """
+    params = dict(args, **extra)
+
+    for name in ('courses[]', 'categories[]'):
+        if params[name] is not None:
+            params[name] = sorted(params[name])
+
+    return params
+
+
+def dependencies(args):
+    """
+    the cache versions of the posts matching args, course filtered
+    responses only go stale with posts in those courses
+    """
+    if args['courses[]'] is not None:
+        return ['course:%s' % id for id in args['courses[]']]
+
+    return ['posts']
+
+
+def total_params(args):
+    """
+    the arguments the number of matching posts depends on
+    """
+    return cache_params({name: args[name] for name in TOTAL_ARGS})
+
+
+def total_key(params):
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+    return cache.key('total', digest)
+
+
+def refresh_total(params):
+    """
+    count the posts matching params and store the count
+    """
+    filters, relevance = post_filters(params)
+    total = db.session.query(func.count(Post.id)).filter(*filters).scalar()
+
+    try:
+        cache.connection.setex(total_key(params), TOTAL_TIMEOUT,
+                               json.dumps({'total': total, 'at': time.time()}))
+    except RedisError:
+        current_app.logger.exception('Storing post total failed')
+
+    return total
+
+
+def approximate_total(args):
+    """
+    the stored number of posts matching args, counted right away only the
+    first time, afterwards refreshed in the background when it gets old
+    """
+    params = total_params(args)
+    key = total_key(params)
+
+    try:
+        stored = cache.connection.get(key)
+    except RedisError:
+        current_app.logger.exception('Reading post total failed')
+        return refresh_total(params)
+
+    if stored is None:
+        return refresh_total(params)
+
+    stored = json.loads(stored.decode('utf-8'))
+
+    if time.time() - stored['at'] > TOTAL_REFRESH_INTERVAL:
+        try:
+            # one refresh per interval, however many requests notice
+            refreshing = cache.connection.set(key + ':refreshing', 1, nx=True,
+                                              ex=TOTAL_REFRESH_INTERVAL)
+        except RedisError:
+            refreshing = False
+
+        if refreshing:
+            post_total.queue(params)
+
+    return stored['total']
+
+
+def paginate_page(query, args):
+    """
+    one page of an ordered query by page number, with the total requested
+    by with_total
+    """
+    if args['with_total'] == 'true':
+        page = query.paginate(args['page'], POSTS_PER_PAGE)
+
+        return page.items, page.total, page.has_next
+
+    # skip the COUNT(*), fetch one extra post to find out whether there is
+    # a next page, and 404 the way paginate() does
+    if args['page'] < 1:
+        return abort(404)
+
+    items = query \
+        .limit(POSTS_PER_PAGE + 1) \
+        .offset((args['page'] - 1) * POSTS_PER_PAGE) \
+        .all()
+
+    if not items and args['page'] != 1:
+        return abort(404)
+
+    has_next = len(items) > POSTS_PER_PAGE
+    items = items[:POSTS_PER_PAGE]
+
+    if args['with_total'] == 'approximate':
+        return items, approximate_total(args), has_next
+
+    return items, None, has_next
+
+
+def paginate_posts(query, args, relevance=None):
+    """
+    one page of the filtered posts query, by page number or by cursor
+    """
+    if args['sort'] == 'relevance':
+        if relevance is None:
+            return abort(400, 'Sorting by relevance requires a query')
+
+        if args['cursor'] is not None:
+            return abort(400, 'Sorting by relevance only supports pages')
+
+        items, total, has_next = paginate_page(
+            query.order_by(desc(relevance), desc(Post.timestamp), desc(Post.id)), args)
+
+        return {
+            'items': items,
+            'total': total,
+            'next_cursor': None
+        }
+
+    column = sort_key_column(args['sort'])
+    query = query.order_by(desc(column), desc(Post.id))
+
+    if args['cursor'] is not None:
+        # keyset pagination, seek past the last post of the previous page
+        # instead of counting and skipping over every post before it
+        if args['cursor']:
+            key, id = decode_cursor(args['cursor'])
+            query = query.filter(
+                or_(
+                    column < key,
+                    and_(column == key, Post.id < id)
+                )
+            )
+
+        # fetch one extra post to find out whether there is a next page
+        items = query.limit(POSTS_PER_PAGE + 1).all()
+        has_next = len(items) > POSTS_PER_PAGE
+        items = items[:POSTS_PER_PAGE]
+
+        return {
+            'items': items,
+            'total': None,
+            'next_cursor': encode_cursor(items[-1], args['sort']) if has_next else None
+        }
+
+    items, total, has_next = paginate_page(query, args)
+
+    return {
+        'items': items,
+        'total': total,
+        'next_cursor': encode_cursor(items[-1], args['sort']) if has_next else None
+    }
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return abort(400, 'Invalid date {}, expected YYYY-MM-DD'.format(value))
+
+
+def post_filters(args):
+    """
+    the filters and, when searching, the relevance expression for the
+    GET /posts/ arguments
+    """
+    filters = [Post.is_deleted == expression.false()]
+
+    if args['courses[]'] is not None:
+        filters.append(Post.course_id.in_(args['courses[]']))
+
+    if args['categories[]'] is not None:
+        filters.append(Post.category_id.in_(args['categories[]']))
+
+    relevance = None
+
+    if args.get('query') is not None:
+        match, relevance = search(args['query'])
+        filters.append(match)
+
+    # compare dates with dates, a datetime never equals a date on sqlite
+    if args['start_date'] is not None:
+        filters.append(Post.due_date >= parse_date(args['start_date']))
+
+    if args['end_date'] is not None:
+        filters.append(Post.due_date < parse_date(args['end_date']))
+
+    return filters, relevance
+
+
+def calendar(args):
+    """
+    the number and, if asked for, the ids of the posts due on each day
+    of the window, from one query over the due date index
+    """
+    start_date = parse_date(args['start_date'])
+    end_date = parse_date(args['end_date'])
+
+    if not start_date < end_date <= start_date + timedelta(days=CALENDAR_MAX_DAYS):
+        return abort(400, 'The calendar spans from 1 to {} days'.format(CALENDAR_MAX_DAYS))
+
+    filters, relevance = post_filters(args)
+
+    if args['ids']:
+        rows = db.session.query(Post.due_date, Post.id) \
+            .filter(*filters) \
+            .order_by(Post.due_date, Post.id) \
+            .all()
+
+        days = OrderedDict()
+
+        for due_date, id in rows:
+            days.setdefault(due_date, []).append(id)
+
+        days = [{'date': due_date, 'count': len(ids), 'posts': ids}
+                for due_date, ids in days.items()]
+    else:
+        rows = db.session.query(Post.due_date, func.count(Post.id)) \
+            .filter(*filters) \
+            .group_by(Post.due_date) \
+            .order_by(Post.due_date) \
+            .all()
+
+        days = [{'date': due_date, 'count': count, 'posts': None}
+                for due_date, count in rows]
+
+    return marshal(days, calendar_day_marshal_model)
+
+
+def list_posts(args):
+    """
+    one marshalled page of posts for the GET /posts/ arguments
+    """
+    filters, relevance = post_filters(args)
+
+    if args['view'] == 'summary':
+        query = summary_query()
+    else:
+        query = post_query()
+
+    result = paginate_posts(query.filter(*filters), args, relevance)
+
+    if args['view'] == 'summary':
+        result['items'] = summarize(result['items'], current_identity())
+
+        return marshal(result, paginated_post_summary_marshal_model)
+
+    return marshal(result, paginated_post_marshal_model)
+
+
+def posts_params(args):
+    # summaries depend on who is asking
+    return cache_params(
+        args, user=current_user_id() if args['view'] == 'summary' else None)
+
+
+def cached_posts(args):
+    """
+    list_posts(args), from the cache when possible
+    """
+    return cache.memoize('posts', posts_params(args), dependencies(args),
+                         lambda: list_posts(args))
+
+
+def invalidate(post):
+    """
+    bump the cache versions of every response showing post
+    """
+    cache.bump('posts', 'course:%d' % post.course_id, 'post:%d' % post.id)
+
 
 def linkify(attrs, new=False):
     attrs[(None, 'target')] = '_blank'
@@ -102,59 +694,10 @@ def linkify(attrs, new=False):
 class PostListResource(Resource):
     @api.doc('list_posts')
     @api.expect(get_posts_parser)
-    @api.marshal_with(paginated_post_marshal_model)
+    @api.response(200, 'Success', paginated_post_marshal_model)
     @auth_required
     def get(self):
-        args = get_posts_parser.parse_args()
-        filters = []
-
-        if args['courses[]'] is not None:
-            filters.append(Post.course_id.in_(args['courses[]']))
-
-        if args['categories[]'] is not None:
-            filters.append(Post.category_id.in_(args['categories[]']))
-
-        if args['query'] is not None:
-            filters.append(
-                or_(
-                    Post.content.like('%{}%'.format(args['query'])),
-                    Post.title.like('%{}%'.format(args['query']))
-                )
-            )
-
-        if args['start_date'] is not None:
-            # because >= does not appear to work correctly, use > with a day before
-            start_date = datetime.strptime(args['start_date'], '%Y-%m-%d') \
-                - timedelta(days=1)
-            filters.append(Post.due_date > start_date)
-
-        if args['end_date'] is not None:
-            end_date = datetime.strptime(args['end_date'], '%Y-%m-%d')
-            filters.append(Post.due_date < end_date)
-
-        # pagination
-        page = args['page']
-
-        if args['sort'] == 'activity':
-            """
-            select * from post
-            left join comment on comment.post_id == post.id
-            group by post.id
-            order by max(post.timestamp, comment.timestamp) desc;
-
-            if there has been comment activity, rank higher
-            """
-            return Post.query \
-                .outerjoin(Comment) \
-                .order_by(desc(Comment.timestamp), desc(Post.timestamp)) \
-                .filter(*filters) \
-                .paginate(page)
-
-        # default sort by time
-        return Post.query \
-            .filter(*filters) \
-            .order_by(desc(Post.timestamp)) \
-            .paginate(page)
+        return cached_posts(get_posts_parser.parse_args())
 
     @api.doc('new_post')
     @api.expect(new_post_marshal_model)
@@ -188,8 +731,12 @@ class PostListResource(Resource):
         if due_date:
             due_date = datetime.strptime(due_date, '%Y-%m-%d')
 
-        # validate data
-        category = Category.query.get(data['category']['id'])
+        # validate data, categories and semesters are cached
+        try:
+            category = reference.category(int(data['category']['id']))
+        except (TypeError, ValueError):
+            category = None
+
         if category is None:
             return abort(400, 'Category does not exist')
 
@@ -197,31 +744,65 @@ class PostListResource(Resource):
         if course is None:
             return abort(400, 'Course does not exist')
 
-        semester = Semester.query.order_by(desc(Semester.id)).first()
+        semester = reference.current_semester()
 
         post = Post(title=title,
                     content=content,
                     due_date=due_date,
-                    category=category,
+                    category_id=category['id'],
                     course=course,
-                    author=current_user(),
-                    semester=semester)
+                    author_id=current_identity().id,
+                    semester_id=semester['id'] if semester else None)
 
         db.session.add(post)
         db.session.commit()
 
+        post = post_query().filter_by(id=post.id).one()
+        invalidate(post)
+
         return post, 201
 
 
+@api.route('/calendar')
+class CalendarResource(Resource):
+    @api.doc('post_calendar')
+    @api.expect(calendar_parser)
+    @api.response(200, 'Success', [calendar_day_marshal_model])
+    @auth_required
+    def get(self):
+        args = calendar_parser.parse_args()
+
+        params = cache_params(args)
+
+        return cache.memoize('calendar', params, dependencies(args),
+                             lambda: calendar(args))
+
+
+@api.route('/batch')
+class PostBatchResource(Resource):
+    @api.doc('get_many_posts')
+    @api.expect(post_batch_parser)
+    @api.marshal_with(post_batch_marshal_model)
+    @auth_required
+    def get(self):
+        args = post_batch_parser.parse_args()
+
+        return fetch_batch(post_query(), Post.id, args['ids[]'])
+
+
 @api.route('/<int:id>/comments/')
 @api.param('id', 'The post id')
 class CommentListResource(Resource):
     @api.doc('new_comment')
     @api.expect(new_comment_marshal_model)
+    @api.response(404, 'Post not found')
     @api.marshal_with(post_marshal_model)
     @auth_required
     def post(self, id):
-        post = Post.query.get(id)
+        # deleted posts take no more comments
+        post = Post.query \
+            .filter(Post.id == id, Post.is_deleted == expression.false()) \
+            .first_or_404()
 
         data = marshal(request.get_json(), new_comment_marshal_model)
         content = data['content']
@@ -246,11 +827,17 @@ class CommentListResource(Resource):
 
         comment = Comment(content=content,
                           post=post,
-                          author=current_user())
+                          author_id=current_identity().id)
+
+        # keep the denormalized activity in step with the comment timestamp
+        post.last_activity_at = func.now()
 
         db.session.add(comment)
         db.session.commit()
 
+        post = post_query().filter_by(id=id).one()
+        invalidate(post)
+
         return post, 201
 
 
@@ -262,31 +849,37 @@ class CommentResource(Resource):
     @api.marshal_with(post_marshal_model)
     @auth_required
     def delete(self, post_id, comment_id):
-        comment = Comment.query.get_or_404(comment_id)
-        user = current_user()
+        deleted = Comment.query \
+            .filter(Comment.id == comment_id,
+                    Comment.post_id == post_id,
+                    Comment.author_id == current_identity().id) \
+            .update(tombstone(Comment), synchronize_session=False)
 
-        if comment.author.id != user.id:
-            return 'Not Comment Owner', 403
+        if not deleted:
+            Comment.query.filter_by(id=comment_id, post_id=post_id).first_or_404()
 
-        deleted_user = User.query.filter_by(
-            email=current_app.config['DELETED_ACCOUNT_EMAIL']).one()
-
-        comment.content = '<p>[deleted]</p>'
-        comment.author = deleted_user
+            return 'Not Comment Owner', 403
 
         db.session.commit()
 
-        return Post.query.get(post_id)
+        post = post_query().filter_by(id=post_id).one()
+        invalidate(post)
+
+        return post
 
 
 @api.route('/<int:id>/cheers/')
 @api.param('id', 'The post id')
 class CheerListResource(Resource):
     @api.doc('new_cheer')
+    @api.response(404, 'Post not found')
     @api.marshal_with(post_marshal_model)
     @auth_required
     def post(self, id):
-        post = Post.query.get(id)
+        # deleted posts take no more cheers
+        post = Post.query \
+            .filter(Post.id == id, Post.is_deleted == expression.false()) \
+            .first_or_404()
         user = current_user()
 
         if user not in post.cheers:
@@ -294,6 +887,9 @@ class CheerListResource(Resource):
 
         db.session.commit()
 
+        post = post_query().filter_by(id=id).one()
+        invalidate(post)
+
         return post, 201
 
 
@@ -301,27 +897,33 @@ class CheerListResource(Resource):
 @api.param('id', 'The post id')
 class PostResource(Resource):
     @api.doc('get_one_post')
-    @api.marshal_with(post_marshal_model)
+    @api.response(200, 'Success', post_marshal_model)
+    @api.response(304, 'Not modified since the If-None-Match etag')
     @auth_required
+    @etag(lambda self, id: cache.tag('post:%d' % id))
     def get(self, id):
-        return Post.query.get_or_404(id)
+        return cache.memoize(
+            'post', id, ['post:%d' % id],
+            lambda: marshal(post_query().filter_by(id=id).first_or_404(),
+                            post_marshal_model)
+        )
 
     @api.doc('delete_one_post')
     @api.marshal_with(post_marshal_model)
     @auth_required
     def delete(self, id):
-        post = Post.query.get_or_404(id)
-        user = current_user()
-
-        if post.author.id != user.id:
-            return 'Not Post Owner', 403
+        deleted = Post.query \
+            .filter(Post.id == id, Post.author_id == current_identity().id) \
+            .update(tombstone(Post), synchronize_session=False)
 
-        deleted_user = User.query.filter_by(
-            email=current_app.config['DELETED_ACCOUNT_EMAIL']).one()
+        if not deleted:
+            Post.query.get_or_404(id)
 
-        post.content = '<p>[deleted]</p>'
-        post.author = deleted_user
+            return 'Not Post Owner', 403
 
         db.session.commit()
 
+        post = post_query().filter_by(id=id).one()
+        invalidate(post)
+
         return post
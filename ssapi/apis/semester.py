@@ -1,7 +1,8 @@
 from flask_praetorian import auth_required
 from flask_restplus import Namespace, Resource, fields
-from sqlalchemy import desc
-from ssapi.db import Semester
+from ssapi.reference import reference
+
+from .conditional import etag
 
 api = Namespace('semesters', description='Semester related operations')
 
@@ -16,7 +17,9 @@ semester_marshal_model = api.model('Semester', {
 @api.route('/')
 class SemesterListResource(Resource):
     @api.doc('list_semesters')
-    @api.marshal_list_with(semester_marshal_model)
+    @api.response(304, 'Not modified since the If-None-Match etag')
     @auth_required
+    @etag()
+    @api.marshal_list_with(semester_marshal_model)
     def get(self):
-        return Semester.query.order_by(desc(Semester.id)).all()
+        return reference.semesters()
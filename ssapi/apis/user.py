@@ -1,12 +1,14 @@
 import jwt
 from jwt.exceptions import DecodeError
 from flask import abort, request, current_app
-from flask_praetorian import auth_required, current_user
+from flask_praetorian import auth_required, current_user, current_user_id
 from flask_praetorian.exceptions import AuthenticationError, MissingUserError
 from flask_restplus import Namespace, Resource, fields, marshal
-from ssapi.db import db, Course, User
+from ssapi.cache import cache
+from ssapi.db import db, usercourses, Course, User
+from ssapi.identity import current_identity
 from ssapi.praetorian import guard
-from ssapi.tasks import verification_email, forgot_password_email, user_deletion
+from ssapi.tasks import queue_once, verification_email, forgot_password_email, user_deletion
 
 from .course import course_marshal_model
 
@@ -26,6 +28,11 @@ verify_user_marshal_model = api.model('Verify User', {
                          default=''),
 })
 
+job_marshal_model = api.model('Queued Job', {
+    'job_id': fields.String(required=True,
+                            description='The id of the queued job'),
+})
+
 refresh_user_marshal_model = api.model('Refresh User', {
     'jwt': fields.String(required=True,
                          description='The old jwt to refresh',
@@ -144,7 +151,7 @@ class UserChangePasswordResource(Resource):
 class UserForgotPasswordResource(Resource):
     @api.doc('forgot_password')
     @api.expect(basic_user_marshal_model)
-    @api.response(200, 'Success')
+    @api.response(200, 'Success', job_marshal_model)
     def post(self):
         data = marshal(request.get_json(), basic_user_marshal_model)
         email = data['email']
@@ -155,10 +162,8 @@ class UserForgotPasswordResource(Resource):
         if user is None:
             return abort(400, 'Account for email {} does not exist'.format(email))
 
-        # queue email
-        forgot_password_email.queue(email)
-
-        return 'OK', 200
+        # queue email, once per cooldown however often it is asked for
+        return {'job_id': queue_once(forgot_password_email, email)}, 200
 
 
 @api.route('/login/magic')
@@ -234,7 +239,7 @@ class UserRegisterResource(Resource):
 class UserResendResource(Resource):
     @api.doc('resend_verification')
     @api.expect(basic_user_marshal_model)
-    @api.response(200, 'Success')
+    @api.response(200, 'Success', job_marshal_model)
     def post(self):
         data = marshal(request.get_json(), basic_user_marshal_model)
         email = data['email']
@@ -248,9 +253,7 @@ class UserResendResource(Resource):
         if user.is_verified:
             return abort(400, 'Account with email {} already verified'.format(email))
 
-        verification_email.queue(email)
-
-        return 'OK', 200
+        return {'job_id': queue_once(verification_email, email)}, 200
 
 
 @api.route('/register/verify')
@@ -287,7 +290,7 @@ class UserVerifyResource(Resource):
 class UserDeleteAccountResource(Resource):
     @api.doc('delete_account')
     @api.expect(delete_account_marshal_model)
-    @api.response(200, 'Success')
+    @api.response(200, 'Success, follow the job at /jobs/<job_id>', job_marshal_model)
     @auth_required
     def post(self):
         data = marshal(request.get_json(), delete_account_marshal_model)
@@ -298,18 +301,37 @@ class UserDeleteAccountResource(Resource):
         current = current_user()
         user = guard.authenticate(current.email, password)
 
-        user_deletion.queue(user.email, remove_content)
+        job = user_deletion.queue(user.email, remove_content, meta={'owner': user.email})
 
-        return 'OK', 200
+        return {'job_id': job.id}, 200
+
+
+def courses_version():
+    return 'courses:%s' % current_user_id()
+
+
+def cached_user_courses():
+    """
+    the marshalled courses of the current user, from the cache when possible
+    """
+    def courses():
+        return Course.query \
+            .join(usercourses, usercourses.c.course_id == Course.id) \
+            .filter(usercourses.c.user_id == current_identity().id) \
+            .order_by(Course.name) \
+            .all()
+
+    return cache.memoize('user-courses', current_user_id(), ['catalog', courses_version()],
+                         lambda: marshal(courses(), course_marshal_model))
 
 
 @api.route('/courses/')
 class UserCoursesListResource(Resource):
     @api.doc('get_user_courses')
-    @api.marshal_list_with(course_marshal_model)
+    @api.response(200, 'Success', [course_marshal_model])
     @auth_required
     def get(self):
-        return current_user().courses
+        return cached_user_courses()
 
 
 @api.route('/courses/<id>')
@@ -324,6 +346,7 @@ class UserCoursesResource(Resource):
         if course not in user.courses:
             user.courses.append(course)
             db.session.commit()
+            cache.bump(courses_version())
 
         return user.courses
 
@@ -337,5 +360,6 @@ class UserCoursesResource(Resource):
         if course in user.courses:
             user.courses.remove(course)
             db.session.commit()
+            cache.bump(courses_version())
 
         return user.courses
@@ -0,0 +1,326 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from flask import current_app
+from redis import RedisError
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import object_session
+from werkzeug.utils import import_string
+from ssapi.db import db
+
+
+class Cache(object):
+    """
+    redis backed cache of marshalled responses
+
+    entries are keyed by the versions of everything they depend on, so a
+    write invalidates by bumping versions instead of finding and deleting
+    entries, the stale entries simply expire
+
+    every entry depends on the 'epoch' version, bumping it invalidates all
+    of them at once
+
+    redis errors are logged and treated as misses, the cache never takes
+    the api down with it
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_ENABLED', True)
+        app.config.setdefault('CACHE_REDIS_URL',
+                              app.config.get('RQ_REDIS_URL', 'redis://localhost:6379/0'))
+        app.config.setdefault('CACHE_CONNECTION_CLASS', 'redis.StrictRedis')
+        app.config.setdefault('CACHE_KEY_PREFIX', 'ssapi:')
+        app.config.setdefault('CACHE_TIMEOUT', 300)
+        # versions nothing read for this long expire, long after the entries
+        # made with them
+        app.config.setdefault('CACHE_VERSION_TIMEOUT', 24 * 60 * 60)
+
+        app.extensions['cache'] = {'connection': None}
+
+    @property
+    def connection(self):
+        # connect on first use, so the connection class can be swapped
+        # after the app is created
+        state = current_app.extensions['cache']
+
+        if state['connection'] is None:
+            connection_class = import_string(current_app.config['CACHE_CONNECTION_CLASS'])
+            state['connection'] = connection_class.from_url(
+                current_app.config['CACHE_REDIS_URL'])
+
+        return state['connection']
+
+    @property
+    def enabled(self):
+        return current_app.config['CACHE_ENABLED']
+
+    def key(self, *parts):
+        return current_app.config['CACHE_KEY_PREFIX'] + ':'.join(str(p) for p in parts)
+
+    def versions(self, *names):
+        """
+        current version tokens for names, missing versions are created
+
+        versions are random tokens rather than counters, so a flushed redis
+        can never hand out a version that was used before, and they can
+        expire once unused for CACHE_VERSION_TIMEOUT seconds, every read
+        puts that off
+        """
+        keys = [self.key('version', name) for name in names]
+        timeout = current_app.config['CACHE_VERSION_TIMEOUT']
+
+        try:
+            pipeline = self.connection.pipeline(transaction=False)
+            pipeline.mget(keys)
+
+            for key in keys:
+                pipeline.expire(key, timeout)
+
+            versions = pipeline.execute()[0]
+
+            for n, version in enumerate(versions):
+                if version is None:
+                    self.connection.set(keys[n], uuid.uuid4().hex, nx=True, ex=timeout)
+                    versions[n] = self.connection.get(keys[n])
+
+            return [v.decode('utf-8') for v in versions]
+        except RedisError:
+            current_app.logger.exception('Cache versions unavailable')
+            return None
+
+    def tag(self, *names):
+        """
+        a token that changes whenever any of names or the epoch is bumped,
+        None when the cache is disabled or unavailable
+        """
+        if not self.enabled:
+            return None
+
+        versions = self.versions('epoch', *names)
+
+        if versions is None:
+            return None
+
+        return hashlib.sha1(':'.join(versions).encode('utf-8')).hexdigest()
+
+    def bump(self, *names):
+        """
+        invalidate every entry depending on any of names
+        """
+        if not names:
+            return
+
+        try:
+            pipeline = self.connection.pipeline()
+
+            for name in names:
+                pipeline.set(self.key('version', name), uuid.uuid4().hex,
+                             ex=current_app.config['CACHE_VERSION_TIMEOUT'])
+
+            pipeline.execute()
+        except RedisError:
+            current_app.logger.exception('Cache bump failed for %s', names)
+
+    def memoize(self, name, params, dependencies, compute):
+        """
+        the cached value of compute() for name and params, computed and
+        stored on a miss
+
+        params and the computed value must be json serializable, the entry
+        is invalidated when any of dependencies is bumped
+        """
+        if not self.enabled:
+            return compute()
+
+        versions = self.versions('epoch', *dependencies)
+
+        if versions is None:
+            return compute()
+
+        digest = hashlib.sha1(
+            json.dumps([params, versions], sort_keys=True).encode('utf-8')
+        ).hexdigest()
+        key = self.key(name, digest)
+
+        try:
+            cached = self.connection.get(key)
+        except RedisError:
+            current_app.logger.exception('Cache read failed for %s', key)
+            cached = None
+
+        if cached is not None:
+            self._count('hits')
+            return json.loads(cached.decode('utf-8'))
+
+        self._count('misses')
+        value = compute()
+
+        try:
+            self.connection.setex(key, current_app.config['CACHE_TIMEOUT'],
+                                  json.dumps(value))
+        except RedisError:
+            current_app.logger.exception('Cache write failed for %s', key)
+
+        return value
+
+    def _count(self, counter):
+        try:
+            self.connection.incr(self.key('stats', counter))
+        except RedisError:
+            pass
+
+    def stats(self):
+        try:
+            hits, misses = self.connection.mget([self.key('stats', 'hits'),
+                                                 self.key('stats', 'misses')])
+        except RedisError:
+            current_app.logger.exception('Cache stats unavailable')
+            hits, misses = None, None
+
+        return {
+            'hits': int(hits or 0),
+            'misses': int(misses or 0)
+        }
+
+    def clear(self):
+        """
+        remove every key under the configured prefix
+        """
+        keys = list(self.connection.scan_iter(
+            match=current_app.config['CACHE_KEY_PREFIX'] + '*'))
+
+        if keys:
+            self.connection.delete(*keys)
+
+
+cache = Cache()
+
+
+class LocalCache(object):
+    """
+    data loaded from the database and kept in every process
+
+    the data is reloaded when its version in redis changes, which is
+    checked at most every <NAME>_CHECK_INTERVAL seconds, and once it is
+    older than <NAME>_TTL seconds, if set
+
+    changes through the orm to the models it is loaded from bump the
+    version on commit, other writes have to call invalidate() themselves
+    """
+
+    def __init__(self, name, models=(), check_interval=5, ttl=None):
+        self.name = name
+        self.check_interval = check_interval
+        self.ttl = ttl
+
+        for model in models:
+            invalidate_on_change(self, model)
+
+    def config(self, key):
+        return current_app.config['{}_{}'.format(self.name.upper(), key)]
+
+    def init_app(self, app):
+        app.config.setdefault('{}_CHECK_INTERVAL'.format(self.name.upper()),
+                              self.check_interval)
+        app.config.setdefault('{}_TTL'.format(self.name.upper()), self.ttl)
+
+        app.extensions[self.name] = {
+            'value': None,
+            'version': None,
+            'checked_at': 0,
+            'loaded_at': 0,
+            'lock': threading.Lock()
+        }
+
+    def load(self):
+        raise NotImplementedError
+
+    @property
+    def value(self):
+        state = current_app.extensions[self.name]
+        now = time.monotonic()
+        ttl = self.config('TTL')
+        expired = ttl is not None and now - state['loaded_at'] >= ttl
+
+        if state['value'] is not None and not expired and \
+                now - state['checked_at'] < self.config('CHECK_INTERVAL'):
+            return state['value']
+
+        # without redis keep whatever this process has, up to the ttl
+        versions = cache.versions(self.name)
+        version = versions[0] if versions is not None else state['version']
+
+        with state['lock']:
+            if state['value'] is None or expired or version != state['version']:
+                state['value'] = self.load()
+                state['version'] = version
+                state['loaded_at'] = now
+
+            state['checked_at'] = now
+
+        return state['value']
+
+    @property
+    def version(self):
+        """
+        the version value was loaded at, None when redis was unavailable
+        """
+        self.value
+
+        return current_app.extensions[self.name]['version']
+
+    def invalidate(self):
+        """
+        reload in this process now and in every other process on their
+        next check
+        """
+        current_app.extensions[self.name]['value'] = None
+        cache.bump(self.name)
+
+    def warm(self, app):
+        """
+        load ahead of the first request, unless the database is not ready
+        """
+        with app.app_context():
+            try:
+                self.value
+            except SQLAlchemyError:
+                app.logger.info('Not warming %s, database unavailable', self.name)
+
+
+def invalidate_on_change(local, model):
+    def changed(mapper, connection, target):
+        object_session(target).info.setdefault('changed_caches', set()).add(local)
+
+    def recreated(target, connection, **kw):
+        # the data of this process came from the dropped table
+        if current_app:
+            current_app.extensions[local.name]['value'] = None
+
+    for identifier in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(model, identifier, changed)
+
+    for identifier in ('after_create', 'after_drop'):
+        event.listen(model.__table__, identifier, recreated)
+
+
+@event.listens_for(db.session, 'after_commit')
+def local_caches_committed(session):
+    for local in session.info.pop('changed_caches', ()):
+        local.invalidate()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def local_caches_rolled_back(session):
+    session.info.pop('changed_caches', None)
+
+
+def init_app(app):
+    cache.init_app(app)
@@ -0,0 +1,174 @@
+import heapq
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from ssapi.cache import LocalCache
+from ssapi.db import db, Course
+
+
+def grams(text):
+    """
+    every substring of text of up to three characters
+    """
+    return {text[n:n + size] for size in (1, 2, 3) for n in range(len(text) - size + 1)}
+
+
+def trigrams(text):
+    return {text[n:n + 3] for n in range(len(text) - 2)}
+
+
+def word_starts(text):
+    """
+    offsets of the words of text
+    """
+    return [match.start() for match in re.finditer(r'\w+', text)]
+
+
+def prefixed(keys, prefix):
+    """
+    the range of the sorted keys starting with prefix
+    """
+    return range(bisect_left(keys, prefix), bisect_left(keys, prefix + '\U0010ffff'))
+
+
+# course codes and their leading parts, like 21:640:135, 21:64 or 21:
+CODE_PREFIX = re.compile(r'\d{1,2}(:\d{0,3}){0,2}$')
+
+# autocomplete results are remembered per index, short names and broad codes
+# match much of the catalog and are typed by everyone
+MEMO_SIZE = 4096
+
+
+class CourseIndex(object):
+    """
+    n-gram index over course names for substring search
+
+    answers what Course.name LIKE '%query%' ORDER BY name would, case
+    insensitive like the mysql collation, but with query taken literally
+    """
+
+    def __init__(self, courses):
+        # positions in name order are the entries of the posting lists, so
+        # walking a posting list yields matches already sorted
+        self.courses = sorted(courses, key=lambda c: (c['name'].lower(), c['id']))
+        self.names = [c['name'].lower() for c in self.courses]
+        self.postings = defaultdict(list)
+
+        for position, name in enumerate(self.names):
+            for gram in grams(name):
+                self.postings[gram].append(position)
+
+        # every name from each of its words on, and every code, sorted for
+        # prefix ranges
+        words = sorted((name[start:], start == 0, position)
+                       for position, name in enumerate(self.names)
+                       for start in word_starts(name))
+        self.words = [word for word, is_start, position in words]
+        self.word_courses = [(is_start, position) for word, is_start, position in words]
+
+        codes = sorted(('{offering_unit}:{subject}:{course_number}'.format(**c), position)
+                       for position, c in enumerate(self.courses))
+        self.codes = [code for code, position in codes]
+        self.code_courses = [position for code, position in codes]
+
+        self.memo = {}
+
+    def search(self, query, limit):
+        """
+        the first limit courses, in name order, with query in their name
+        """
+        query = query.lower()
+
+        if not query:
+            candidates = range(len(self.names))
+        elif len(query) < 3:
+            # short queries have a posting list of their own
+            candidates = self.postings.get(query, ())
+        else:
+            # every match is in every trigram posting list of the query,
+            # walk the shortest one and check for the whole query
+            candidates = min((self.postings.get(gram, ()) for gram in trigrams(query)),
+                             key=len)
+
+        results = []
+
+        for position in candidates:
+            if len(results) >= limit:
+                break
+
+            if query in self.names[position]:
+                results.append(self.courses[position])
+
+        return results
+
+    def autocomplete(self, query, limit):
+        """
+        the best limit courses for a name or code being typed
+
+        names starting with query rank first, then names with a word
+        starting with query, then the more popular courses
+        """
+        query = ' '.join(query.lower().split())
+
+        if not query:
+            return []
+
+        if (query, limit) in self.memo:
+            return self.memo[query, limit]
+
+        if CODE_PREFIX.match(query):
+            ranked = ((0, position) for position in
+                      (self.code_courses[n] for n in prefixed(self.codes, query)))
+        else:
+            # best tier of every course with a word starting with query
+            tiers = {}
+
+            for n in prefixed(self.words, query):
+                is_start, position = self.word_courses[n]
+                tiers[position] = min(tiers.get(position, 1), 0 if is_start else 1)
+
+            ranked = ((tier, position) for position, tier in tiers.items())
+
+        # positions are in name order, so they break ties by name
+        best = heapq.nsmallest(
+            limit, ranked,
+            key=lambda item: (item[0], -self.courses[item[1]]['popularity'], item[1]))
+        results = [self.courses[position] for tier, position in best]
+
+        if len(self.memo) >= MEMO_SIZE:
+            self.memo.clear()
+
+        self.memo[query, limit] = results
+
+        return results
+
+
+class Catalog(LocalCache):
+    """
+    process local course index, see LocalCache
+
+    bulk loads of the catalog have to call invalidate() themselves
+    """
+
+    def __init__(self):
+        super().__init__('catalog', models=(Course,))
+
+    @property
+    def index(self):
+        return self.value
+
+    def load(self):
+        rows = db.session.query(Course.id, Course.name, Course.offering_unit,
+                                Course.subject, Course.course_number, Course.popularity) \
+            .filter(Course.is_retired.is_(False)) \
+            .all()
+
+        return CourseIndex([row._asdict() for row in rows])
+
+
+catalog = Catalog()
+
+
+def init_app(app):
+    catalog.init_app(app)
+    catalog.warm(app)
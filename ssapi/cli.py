@@ -1,12 +1,20 @@
 import click
+import json
+import signal
+import subprocess
+import sys
+import time
 from datetime import date
-from flask.cli import with_appcontext
 from flask import current_app
+from flask.cli import with_appcontext
 
 
 def init_app(app):
     app.cli.add_command(seed_test_data)
     app.cli.add_command(seed_test_user)
+    app.cli.add_command(import_courses)
+    app.cli.add_command(schedule_jobs)
+    app.cli.add_command(rq_workers)
 
 
 @click.command()
@@ -98,10 +106,7 @@ def seed_test_data():
              is_verified=True),
         User(email='deleteaccount@fakerutgers.edu',
              password=guard.encrypt_password('strongbad42'),
-             is_verified=True),
-        User(email=current_app.config['DELETED_ACCOUNT_EMAIL'],
-             password='42',
-             is_verified=False)
+             is_verified=True)
     ]
 
     categories = [
@@ -152,3 +157,223 @@ def seed_test_data():
 
     print('Seeded database with {} items'
           .format(len(courses) + len(users) + len(categories) + len(semesters) + len(posts) + len(comments)))
+
+
+def iter_json_array(fp, chunk_size=1 << 16):
+    """
+    the items of the json array in fp, parsed one at a time while reading
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    expect = '['
+
+    while True:
+        chunk = fp.read(chunk_size)
+        buffer = (buffer + chunk).lstrip()
+
+        while buffer:
+            if expect == '[':
+                if buffer[0] != '[':
+                    raise ValueError('Expected a JSON array')
+
+                buffer = buffer[1:].lstrip()
+                expect = 'item'
+            elif buffer[0] == ']':
+                return
+            elif expect == 'separator':
+                if buffer[0] != ',':
+                    raise ValueError('Expected , or ] after an item')
+
+                buffer = buffer[1:].lstrip()
+                expect = 'item'
+            else:
+                try:
+                    item, end = decoder.raw_decode(buffer)
+                except ValueError:
+                    # incomplete, read on
+                    break
+
+                yield item
+
+                buffer = buffer[end:].lstrip()
+                expect = 'separator'
+
+        if not chunk:
+            raise ValueError('Unterminated JSON array')
+
+
+def batches(items, size):
+    for n in range(0, len(items), size):
+        yield items[n:n + size]
+
+
+@click.command('import-courses')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--retire-missing', is_flag=True,
+              help='Retire courses of the imported offering units missing from the files')
+@click.option('--dry-run', is_flag=True, help='Report the changes without applying them')
+@click.option('--batch-size', default=1000, show_default=True)
+@with_appcontext
+def import_courses(paths, retire_missing, dry_run, batch_size):
+    """
+    import term/campus course catalogs, json arrays of courses
+    """
+    from sqlalchemy import bindparam
+    from .cache import cache
+    from .catalog import catalog
+    from .db import db, Course
+
+    started = time.perf_counter()
+    courses = Course.__table__
+
+    # course code to name, the first listing of a code wins
+    imported = {}
+    duplicated = 0
+
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as fp:
+            try:
+                for course in iter_json_array(fp):
+                    code = (course['offering_unit'], course['subject'], course['course_number'])
+
+                    if code in imported:
+                        duplicated += 1
+                    else:
+                        imported[code] = course['name']
+            except (KeyError, TypeError, ValueError) as e:
+                raise click.ClickException('{}: invalid course catalog, {!r}'.format(path, e))
+
+    existing = {
+        (offering_unit, subject, course_number): (id, name, is_retired)
+        for id, name, offering_unit, subject, course_number, is_retired in
+        db.session.query(Course.id, Course.name, Course.offering_unit, Course.subject,
+                         Course.course_number, Course.is_retired)
+    }
+
+    inserts = [{'offering_unit': code[0], 'subject': code[1], 'course_number': code[2],
+                'name': name, 'is_retired': False}
+               for code, name in imported.items() if code not in existing]
+    updates = [{'_id': existing[code][0], 'name': name}
+               for code, name in imported.items()
+               if code in existing and existing[code][1:] != (name, False)]
+    retirements = []
+
+    if retire_missing:
+        offering_units = {code[0] for code in imported}
+        retirements = [id for code, (id, name, is_retired) in existing.items()
+                       if code[0] in offering_units and code not in imported and not is_retired]
+
+    # everything in one transaction, in batched statements
+    try:
+        for batch in batches(inserts, batch_size):
+            db.session.execute(courses.insert(), batch)
+
+        for batch in batches(updates, batch_size):
+            db.session.execute(
+                courses.update()
+                .where(courses.c.id == bindparam('_id'))
+                .values(name=bindparam('name'), is_retired=False),
+                batch
+            )
+
+        for batch in batches(retirements, batch_size):
+            db.session.execute(
+                courses.update()
+                .where(courses.c.id.in_(batch))
+                .values(is_retired=True)
+            )
+
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if not dry_run and (inserts or updates or retirements):
+        catalog.invalidate()
+
+        # posts show the names of their courses
+        if updates:
+            cache.bump('epoch')
+
+    print('{}Read {} courses from {} files, {} duplicated codes'
+          .format('[dry run] ' if dry_run else '', len(imported) + duplicated,
+                  len(paths), duplicated))
+    print('Inserted {}, updated {}, retired {}, unchanged {} in {:.2f}s'
+          .format(len(inserts), len(updates), len(retirements),
+                  len(imported) - len(inserts) - len(updates),
+                  time.perf_counter() - started))
+
+
+@click.command('schedule-jobs')
+@with_appcontext
+def schedule_jobs():
+    """
+    register the periodic jobs with the rq scheduler, safe to rerun
+    """
+    from .tasks import course_popularity, deliver_mail
+
+    course_popularity.cron('*/15 * * * *', 'course-popularity')
+    deliver_mail.cron('* * * * *', 'deliver-mail')
+
+    print('Scheduled course-popularity and deliver-mail')
+
+
+def worker_queues(queues, processes, reserved):
+    """
+    the queues of every worker, in priority order, the first reserved of
+    them leaving bulk alone so long jobs never take up every worker
+    """
+    interactive = [queue for queue in queues if queue != 'bulk']
+
+    return [interactive if n < reserved else list(queues) for n in range(processes)]
+
+
+@click.command('rq-workers')
+@click.option('--processes', '-p', default=3, show_default=True,
+              help='Number of worker processes')
+@click.option('--reserved', '-r', default=1, show_default=True,
+              help='Number of them kept off the bulk queue')
+@with_appcontext
+def rq_workers(processes, reserved):
+    """
+    run rq workers taking jobs by queue priority, restarting any that exit
+    until stopped
+    """
+    plans = worker_queues(current_app.config['RQ_QUEUES'], processes, min(reserved, processes - 1))
+
+    def start(queues):
+        # a session of their own, so only the shutdown sent on below reaches them
+        return subprocess.Popen([sys.executable, '-m', 'flask', 'rq', 'worker'] + queues,
+                                start_new_session=True)
+
+    workers = [start(queues) for queues in plans]
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+        # a warm shutdown, every worker finishes its current job
+        for worker in workers:
+            if worker.poll() is None:
+                worker.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for queues in plans:
+        print('Started worker on {}'.format(', '.join(queues)))
+
+    while not stopping:
+        for n, worker in enumerate(workers):
+            if worker.poll() is not None and not stopping:
+                print('Worker on {} exited with {}, restarting'
+                      .format(', '.join(plans[n]), worker.returncode))
+                workers[n] = start(plans[n])
+
+        time.sleep(1)
+
+    for worker in workers:
+        worker.wait()
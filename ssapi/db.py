@@ -1,7 +1,10 @@
+import bleach
+from html import unescape
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import MetaData
-from sqlalchemy.sql import func
+from sqlalchemy import DDL, MetaData, event
+from sqlalchemy.orm import validates
+from sqlalchemy.sql import expression, func
 
 convention = {
     "ix": 'ix_%(column_0_label)s',
@@ -28,6 +31,24 @@ def init_app(app):
     migrate.init_app(app)
 
 
+def plain_text(html):
+    """
+    strip markup from sanitized post or comment content
+    """
+    return unescape(bleach.clean(html, tags=[], strip=True))
+
+
+def tombstone(model):
+    """
+    the update values that delete posts or comments of model, the first
+    deletion counts
+    """
+    return {
+        model.is_deleted: True,
+        model.deleted_at: func.coalesce(model.deleted_at, func.now())
+    }
+
+
 usercourses = db.Table('usercourses',
                        db.Column('user_id', db.Integer, db.ForeignKey(
                            'user.id'), primary_key=True),
@@ -80,6 +101,18 @@ class Course(db.Model):
     offering_unit = db.Column(db.String(8), nullable=False)
     subject = db.Column(db.String(8), nullable=False)
     course_number = db.Column(db.String(8), nullable=False)
+    # no longer offered, kept for the posts of earlier terms
+    is_retired = db.Column(db.Boolean, nullable=False, default=False,
+                           server_default=expression.false())
+    # enrollments plus posts, refreshed periodically by the
+    # course_popularity job
+    popularity = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (
+        # course codes, complete or by leading parts
+        db.Index('ix_course_offering_unit_subject_course_number',
+                 'offering_unit', 'subject', 'course_number', unique=True),
+    )
 
 
 class Category(db.Model):
@@ -105,7 +138,20 @@ class Post(db.Model):
     is_archived = db.Column(db.Boolean, nullable=False, default=False)
     due_date = db.Column(db.Date)
 
-    author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # title and markup free content, maintained for full-text search
+    search_text = db.Column(db.Text, nullable=False, default='')
+
+    # newest of the post and its comments, denormalized for sort=activity
+    last_activity_at = db.Column(db.DateTime, nullable=False,
+                                 server_default=func.now())
+
+    # tombstone, deleted posts keep their comments but leave every list
+    is_deleted = db.Column(db.Boolean, nullable=False, default=False,
+                           server_default=expression.false())
+    deleted_at = db.Column(db.DateTime)
+
+    # none once the author deleted their account
+    author_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     author = db.relationship('User', uselist=False)
 
     course_id = db.Column(db.Integer, db.ForeignKey(
@@ -120,9 +166,41 @@ class Post(db.Model):
         'category.id'), nullable=False)
     category = db.relationship('Category', uselist=False)
 
-    comments = db.relationship('Comment')
+    comments = db.relationship('Comment', order_by='Comment.id')
     cheers = db.relationship('User', secondary=userpostcheers)
 
+    __table_args__ = (
+        # one per filter of GET /posts/, followed by the tombstone every list
+        # skips and the sort column
+        db.Index('ix_post_is_deleted_timestamp', 'is_deleted', 'timestamp'),
+        db.Index('ix_post_course_id_is_deleted_timestamp',
+                 'course_id', 'is_deleted', 'timestamp'),
+        db.Index('ix_post_category_id_is_deleted_timestamp',
+                 'category_id', 'is_deleted', 'timestamp'),
+        db.Index('ix_post_is_deleted_due_date', 'is_deleted', 'due_date'),
+        db.Index('ix_post_is_deleted_last_activity_at', 'is_deleted', 'last_activity_at'),
+        db.Index('ix_post_course_id_is_deleted_last_activity_at',
+                 'course_id', 'is_deleted', 'last_activity_at'),
+    )
+
+    @validates('title', 'content')
+    def update_search_text(self, key, value):
+        title = value if key == 'title' else self.title
+        content = value if key == 'content' else self.content
+
+        self.search_text = '{} {}'.format(title or '', plain_text(content or ''))
+
+        return value
+
+
+# FULLTEXT only exists in mysql, elsewhere search falls back to LIKE and an
+# index over all of search_text would be dead weight, as in the migration
+event.listen(
+    Post.__table__, 'after_create',
+    DDL('CREATE FULLTEXT INDEX ix_post_search_text ON post (search_text)')
+    .execute_if(dialect='mysql')
+)
+
 
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -134,5 +212,15 @@ class Comment(db.Model):
     post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
     post = db.relationship('Post', uselist=False)
 
-    author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # tombstone, deleted comments stay in their thread as a placeholder
+    is_deleted = db.Column(db.Boolean, nullable=False, default=False,
+                           server_default=expression.false())
+    deleted_at = db.Column(db.DateTime)
+
+    # none once the author deleted their account
+    author_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     author = db.relationship('User', uselist=False)
+
+    __table_args__ = (
+        db.Index('ix_comment_post_id_timestamp', 'post_id', 'timestamp'),
+    )
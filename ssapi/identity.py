@@ -0,0 +1,122 @@
+import json
+from collections import namedtuple
+from flask import current_app, g
+from flask_praetorian import current_user_id
+from flask_praetorian.exceptions import PraetorianError
+from redis import RedisError
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from ssapi.cache import cache
+from ssapi.db import db, User
+
+Identity = namedtuple('Identity', ['id', 'email', 'is_verified'])
+
+
+def identity_key(email):
+    return cache.key('identity', email)
+
+
+def load_identity(email):
+    row = db.session.query(User.id, User.email, User.is_verified) \
+        .filter_by(email=email) \
+        .one_or_none()
+
+    return Identity(*row) if row is not None else None
+
+
+def identify(email):
+    """
+    the identity of the user with email, None if there is none
+
+    identities are kept in redis for IDENTITY_TTL seconds and forgotten
+    whenever the user changes through the orm
+    """
+    if not cache.enabled:
+        return load_identity(email)
+
+    key = identity_key(email)
+
+    try:
+        cached = cache.connection.get(key)
+    except RedisError:
+        current_app.logger.exception('Identity read failed for %s', email)
+        return load_identity(email)
+
+    if cached is not None:
+        return Identity(*json.loads(cached.decode('utf-8')))
+
+    identity = load_identity(email)
+
+    if identity is not None:
+        try:
+            cache.connection.setex(key, current_app.config['IDENTITY_TTL'],
+                                   json.dumps(identity))
+        except RedisError:
+            current_app.logger.exception('Identity write failed for %s', email)
+
+    return identity
+
+
+def current_identity():
+    """
+    like current_user(), without a query for the user on most requests
+
+    for reads that only need who is asking, writes through the user's
+    relationships still need current_user()
+    """
+    email = current_user_id()
+    identities = g.setdefault('identities', {})
+
+    if email not in identities:
+        identities[email] = identify(email)
+
+    PraetorianError.require_condition(
+        identities[email] is not None,
+        "Could not identify the current user from the current id",
+    )
+
+    return identities[email]
+
+
+def forget(*emails):
+    """
+    drop the cached identities of emails, in this request and in redis
+    """
+    if not emails:
+        return
+
+    identities = g.get('identities', {})
+
+    for email in emails:
+        identities.pop(email, None)
+
+    try:
+        cache.connection.delete(*[identity_key(email) for email in emails])
+    except RedisError:
+        current_app.logger.exception('Identity forget failed for %s', emails)
+
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def user_changed(mapper, connection, target):
+    # verified, password changed, deleted, or registered again after being
+    # deleted under a new id
+    object_session(target).info.setdefault('changed_identities', set()).add(target.email)
+
+
+@event.listens_for(db.session, 'after_commit')
+def identities_committed(session):
+    emails = session.info.pop('changed_identities', ())
+
+    if emails and current_app:
+        forget(*emails)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def identities_rolled_back(session):
+    session.info.pop('changed_identities', None)
+
+
+def init_app(app):
+    app.config.setdefault('IDENTITY_TTL', 60)
@@ -0,0 +1,241 @@
+import json
+import smtplib
+import time
+import uuid
+from flask import current_app
+from flask_mail import Message
+from redis import RedisError
+from rq.timeouts import JobTimeoutException
+from ssapi.cache import cache
+
+# the longest a drain may run, a drain lock older than this belongs to a
+# drain that died
+DRAIN_TIMEOUT = 30 * 60
+
+
+def outbox_key(*parts):
+    return cache.key('outbox', *parts)
+
+
+def dump(message, attempts=0):
+    return json.dumps({
+        'subject': message.subject,
+        'recipients': message.recipients,
+        'body': message.body,
+        'html': message.html,
+        'sender': message.sender,
+        'attempts': attempts
+    })
+
+
+def load(item):
+    data = json.loads(item)
+    message = Message(data['subject'],
+                      recipients=data['recipients'],
+                      body=data['body'],
+                      html=data['html'],
+                      sender=data['sender'])
+
+    return message, data['attempts']
+
+
+class Outbox(object):
+    """
+    mail waiting for delivery, kept in redis
+
+    drain() delivers it in batches of MAIL_BATCH_SIZE over one smtp session,
+    checked with a NOOP before every batch and reopened when it fails
+
+    a message that cannot be delivered is retried after MAIL_RETRY_DELAY
+    seconds, doubling with every attempt, and given up on after
+    MAIL_MAX_ATTEMPTS attempts
+
+    messages being delivered sit in a processing list until they are sent
+    or scheduled for retry, the next drain queues again whatever a drain
+    that died left there
+    """
+
+    def __init__(self, mail, connection):
+        self.mail = mail
+        self.connection = connection
+        self.session = None
+
+    def put(self, message):
+        # taken from the other end, oldest first
+        self.connection.lpush(outbox_key('queued'), dump(message))
+
+    def wake(self):
+        """
+        queue the retries that are due ahead of everything else
+        """
+        def move(pipeline):
+            due = pipeline.zrangebyscore(outbox_key('retries'), 0, time.time())
+            pipeline.multi()
+
+            if due:
+                pipeline.zrem(outbox_key('retries'), *due)
+                pipeline.rpush(outbox_key('queued'), *due)
+
+        self.connection.transaction(move, outbox_key('retries'))
+
+    def recover(self):
+        """
+        queue again what a drain that died left in the processing list
+        """
+        while self.connection.rpoplpush(outbox_key('processing'),
+                                        outbox_key('queued')) is not None:
+            pass
+
+    def take(self, count):
+        """
+        up to count messages, oldest first, moved to the processing list
+        """
+        pipeline = self.connection.pipeline(transaction=False)
+
+        for _ in range(count):
+            pipeline.rpoplpush(outbox_key('queued'), outbox_key('processing'))
+
+        return [(item,) + load(item.decode('utf-8'))
+                for item in pipeline.execute() if item is not None]
+
+    def done(self, item):
+        self.connection.lrem(outbox_key('processing'), 1, item)
+
+    def retry(self, item, message, attempts):
+        attempts += 1
+        pipeline = self.connection.pipeline()
+
+        if attempts >= current_app.config['MAIL_MAX_ATTEMPTS']:
+            current_app.logger.error('Giving up on mail to %s after %d attempts',
+                                     message.recipients, attempts)
+        else:
+            delay = current_app.config['MAIL_RETRY_DELAY'] * 2 ** (attempts - 1)
+            pipeline.zadd(outbox_key('retries'), time.time() + delay,
+                          dump(message, attempts))
+
+        pipeline.lrem(outbox_key('processing'), 1, item)
+        pipeline.execute()
+
+    def check(self):
+        """
+        close the smtp session unless it answers a NOOP
+        """
+        if self.session is None or self.session.host is None:
+            return
+
+        try:
+            healthy = self.session.host.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            healthy = False
+
+        if not healthy:
+            current_app.logger.warning('Reopening unhealthy mail session')
+            self.close()
+
+    def open(self):
+        if self.session is None:
+            self.session = self.mail.connect().__enter__()
+
+        return self.session
+
+    def close(self):
+        if self.session is not None:
+            try:
+                self.session.__exit__(None, None, None)
+            except (smtplib.SMTPException, OSError):
+                pass
+
+            self.session = None
+
+    def drain(self):
+        """
+        deliver every queued message, the numbers delivered and retried,
+        nothing while another drain is running
+        """
+        token = uuid.uuid4().hex
+
+        if not self.connection.set(outbox_key('draining'), token, nx=True, ex=DRAIN_TIMEOUT):
+            return 0, 0
+
+        try:
+            self.recover()
+            self.wake()
+
+            return self.deliver()
+        finally:
+            self.close()
+
+            if self.connection.get(outbox_key('draining')) == token.encode('utf-8'):
+                self.connection.delete(outbox_key('draining'))
+
+    def deliver(self):
+        delivered = retried = 0
+
+        while True:
+            batch = self.take(current_app.config['MAIL_BATCH_SIZE'])
+
+            if not batch:
+                return delivered, retried
+
+            self.check()
+
+            for n, (item, message, attempts) in enumerate(batch):
+                try:
+                    session = self.open()
+                except (smtplib.SMTPException, OSError):
+                    current_app.logger.exception('Mail server unavailable')
+
+                    # try the rest of the batch again later
+                    for item, message, attempts in batch[n:]:
+                        self.retry(item, message, attempts)
+
+                    return delivered, retried + len(batch) - n
+
+                try:
+                    session.send(message)
+                except JobTimeoutException:
+                    # out of time, the rest waits in the processing list
+                    raise
+                except Exception as e:
+                    current_app.logger.exception('Mail to %s failed', message.recipients)
+
+                    if is_permanent(e):
+                        self.done(item)
+                        continue
+
+                    self.retry(item, message, attempts)
+                    retried += 1
+
+                    # the session is in no known state after anything but
+                    # a rejection
+                    if not isinstance(e, (smtplib.SMTPResponseException,
+                                          smtplib.SMTPRecipientsRefused)):
+                        self.close()
+                else:
+                    self.done(item)
+                    delivered += 1
+
+
+def is_permanent(error):
+    """
+    whether the server rejected the message for good
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, response in error.recipients.values())
+
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def send(mail, message):
+    """
+    queue message for delivery by the deliver_mail job, True if it was
+    queued, sends right away without redis
+    """
+    try:
+        Outbox(mail, cache.connection).put(message)
+    except RedisError:
+        current_app.logger.exception('Mail outbox unavailable, sending directly')
+        mail.send(message)
+        return False
+
+    return True
@@ -1,7 +1,146 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from flask import abort, current_app
 from flask_praetorian import Praetorian
+from flask_praetorian.exceptions import AuthenticationError, MissingUserError
+from redis import RedisError
+from .cache import cache
+from .db import db
 
 
-guard = Praetorian()
+class Guard(Praetorian):
+    """
+    praetorian with the password hash cost set by PASSWORD_HASH_ROUNDS and
+    hashing limited to PASSWORD_HASH_CONCURRENCY at a time
+
+    the limit holds across every worker process through redis, a request
+    that finds no free slot within PASSWORD_HASH_WAIT seconds gets a 503
+    instead of holding up its worker, fails open without redis
+
+    hashes made at another cost or with another scheme are replaced on the
+    next successful authenticate
+    """
+
+    def init_app(self, app, user_class, is_blacklisted=None):
+        super().init_app(app, user_class, is_blacklisted)
+
+        app.config.setdefault('PASSWORD_HASH_ROUNDS', 25000)
+        app.config.setdefault('PASSWORD_HASH_CONCURRENCY', 4)
+        app.config.setdefault('PASSWORD_HASH_WAIT', 1.0)
+        # slots of processes that died while hashing are reclaimed after this
+        app.config.setdefault('PASSWORD_HASH_SLOT_TIMEOUT', 30)
+
+        scheme = self.hash_scheme or 'pbkdf2_sha512'
+        rounds = app.config['PASSWORD_HASH_ROUNDS']
+
+        # every hash not of the current scheme and cost needs an update
+        self.pwd_ctx.update(**{
+            'default': scheme,
+            'deprecated': 'auto',
+            '{}__default_rounds'.format(scheme): rounds,
+            '{}__min_rounds'.format(scheme): rounds,
+            '{}__max_rounds'.format(scheme): rounds,
+        })
+
+        self.hashing_slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_CONCURRENCY'])
+
+    @contextmanager
+    def hashing(self):
+        """
+        hold one of the hashing slots
+        """
+        wait = current_app.config['PASSWORD_HASH_WAIT']
+
+        if not self.hashing_slots.acquire(timeout=wait):
+            return abort(503, 'Too many logins at once, try again shortly')
+
+        try:
+            token = acquire_shared_slot(wait)
+
+            try:
+                yield
+            finally:
+                release_shared_slot(token)
+        finally:
+            self.hashing_slots.release()
+
+    def authenticate(self, username, password):
+        user = self.user_class.lookup(username)
+        MissingUserError.require_condition(
+            user is not None,
+            'Could not find the requested user',
+        )
+
+        with self.hashing():
+            verified, new_hash = self.pwd_ctx.verify_and_update(password, user.password)
+
+        AuthenticationError.require_condition(
+            verified,
+            'The password is incorrect',
+        )
+
+        if new_hash is not None:
+            user.password = new_hash
+            db.session.commit()
+
+        return user
+
+    def encrypt_password(self, raw_password):
+        with self.hashing():
+            return super().encrypt_password(raw_password)
+
+
+guard = Guard()
+
+
+def shared_slots_key():
+    return cache.key('password-hashing')
+
+
+def acquire_shared_slot(wait):
+    """
+    a token for one of the hashing slots of all processes, None when redis
+    is unavailable
+    """
+    key = shared_slots_key()
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+
+    while True:
+        now = time.time()
+
+        try:
+            pipeline = cache.connection.pipeline()
+            pipeline.zremrangebyscore(
+                key, 0, now - current_app.config['PASSWORD_HASH_SLOT_TIMEOUT'])
+            pipeline.zadd(key, now, token)
+            pipeline.zrank(key, token)
+            rank = pipeline.execute()[-1]
+
+            if rank < current_app.config['PASSWORD_HASH_CONCURRENCY']:
+                return token
+
+            cache.connection.zrem(key, token)
+        except RedisError:
+            current_app.logger.exception('Password hashing slots unavailable')
+            return None
+
+        if time.monotonic() >= deadline:
+            return abort(503, 'Too many logins at once, try again shortly')
+
+        time.sleep(0.05)
+
+
+def release_shared_slot(token):
+    if token is None:
+        return
+
+    try:
+        cache.connection.zrem(shared_slots_key(), token)
+    except RedisError:
+        current_app.logger.exception('Password hashing slot not released')
 
 
 def init_app(app):
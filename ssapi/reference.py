@@ -0,0 +1,55 @@
+from ssapi.cache import LocalCache
+from ssapi.db import db, Category, Semester
+
+
+class Reference(LocalCache):
+    """
+    process local categories and semesters, see LocalCache
+
+    these tables change a few times a year, they are also reloaded hourly
+    in case they were changed behind the orm
+    """
+
+    def __init__(self):
+        super().__init__('reference', models=(Category, Semester), ttl=60 * 60)
+
+    def load(self):
+        categories = [{'id': id, 'name': name} for id, name in
+                      db.session.query(Category.id, Category.name).order_by(Category.id)]
+        semesters = [{'id': id, 'year': year, 'season': season} for id, year, season in
+                     db.session.query(Semester.id, Semester.year, Semester.season)
+                     .order_by(Semester.id.desc())]
+
+        return {
+            'categories': categories,
+            'categories_by_id': {category['id']: category for category in categories},
+            'semesters': semesters
+        }
+
+    def categories(self):
+        return self.value['categories']
+
+    def category(self, id):
+        """
+        the category with id, None if there is none
+        """
+        return self.value['categories_by_id'].get(id)
+
+    def semesters(self):
+        """
+        the semesters, latest first
+        """
+        return self.value['semesters']
+
+    def current_semester(self):
+        semesters = self.semesters()
+
+        return semesters[0] if semesters else None
+
+
+reference = Reference()
+
+
+def init_app(app):
+    reference.init_app(app)
+    reference.warm(app)
@@ -1,14 +1,32 @@
 import jwt
+import uuid
 from flask import current_app
 from flask_mail import Mail, Message
 from flask_rq2 import RQ
-from ssapi.db import db, User, Post, Comment
+from redis import RedisError
+from rq import get_current_job
+from sqlalchemy import func, select
+from sqlalchemy.sql import expression
+from ssapi import outbox
+from ssapi.cache import cache
+from ssapi.catalog import catalog
+from ssapi.db import db, tombstone, usercourses, userpostcheers, \
+    User, Post, Comment, Course
 
 mail = Mail()
 rq = RQ()
 
 
 def init_app(app):
+    # highest priority first, jobs someone is waiting on go to high and
+    # long running ones to bulk
+    app.config.setdefault('RQ_QUEUES', ['high', 'default', 'bulk'])
+    app.config.setdefault('USER_DELETION_CHUNK_SIZE', 1000)
+    app.config.setdefault('MAIL_BATCH_SIZE', 100)
+    app.config.setdefault('MAIL_MAX_ATTEMPTS', 5)
+    app.config.setdefault('MAIL_RETRY_DELAY', 30)
+    app.config.setdefault('EMAIL_JOB_COOLDOWN', 60)
+
     rq.init_app(app)
     mail.init_app(app)
 
@@ -18,7 +36,101 @@ def add(x, y):
     return x + y
 
 
+def send_mail(message):
+    """
+    queue message in the outbox and make sure a deliver_mail job is coming
+    """
+    if not outbox.send(mail, message):
+        return
+
+    try:
+        # one waiting job is enough however much mail comes in meanwhile,
+        # should it get lost the minutely run takes over
+        queued = cache.connection.set(outbox.outbox_key('job'), 1, nx=True, ex=60)
+    except RedisError:
+        queued = False
+
+    if queued:
+        deliver_mail.queue()
+
+
+@rq.job('high', timeout=outbox.DRAIN_TIMEOUT)
+def deliver_mail():
+    """
+    deliver the outbox over one smtp session, also run every minute for the
+    retries
+    """
+    try:
+        cache.connection.delete(outbox.outbox_key('job'))
+    except RedisError:
+        pass
+
+    delivered, retried = outbox.Outbox(mail, cache.connection).drain()
+
+    return {'delivered': delivered, 'retried': retried}
+
+
+def queue_once(job, email):
+    """
+    queue job for email unless it was queued for email within the last
+    EMAIL_JOB_COOLDOWN seconds, the id of the job either way
+    """
+    key = cache.key('jobs', job.__name__, email)
+    job_id = str(uuid.uuid4())
+
+    try:
+        if not cache.connection.set(key, job_id, nx=True,
+                                    ex=current_app.config['EMAIL_JOB_COOLDOWN']):
+            existing = cache.connection.get(key)
+
+            # None if it expired in between, queue anew then
+            if existing is not None:
+                return existing.decode('utf-8')
+    except RedisError:
+        current_app.logger.exception('Job deduplication unavailable')
+
+    try:
+        return job.queue(email, job_id=job_id, meta={'owner': email}).id
+    except Exception:
+        # release the claim, it points at a job that was never queued
+        try:
+            if cache.connection.get(key) == job_id.encode('utf-8'):
+                cache.connection.delete(key)
+        except RedisError:
+            pass
+
+        raise
+
+
 @rq.job
+def post_total(params):
+    # the apis import this module, import the counting lazily
+    from ssapi.apis.post import refresh_total
+
+    return refresh_total(params)
+
+
+@rq.job('bulk')
+def course_popularity():
+    """
+    recount enrollments and posts of every course, in one statement
+    """
+    enrollments = select([func.count()]) \
+        .where(usercourses.c.course_id == Course.id) \
+        .as_scalar()
+    posts = select([func.count(Post.id)]) \
+        .where(Post.course_id == Course.id) \
+        .where(Post.is_deleted == expression.false()) \
+        .as_scalar()
+
+    db.session.execute(Course.__table__.update().values(popularity=enrollments + posts))
+    db.session.commit()
+
+    # the course index ranks by popularity
+    catalog.invalidate()
+
+
+@rq.job('high')
 def verification_email(email):
     user = User.query.filter_by(email=email).one()
     to_email = user.email
@@ -36,10 +148,10 @@ def verification_email(email):
     message = Message(subject,
                       recipients=[to_email],
                       body=content)
-    mail.send(message)
+    send_mail(message)
 
 
-@rq.job
+@rq.job('high')
 def forgot_password_email(email):
     user = User.query.filter_by(email=email).one()
     to_email = user.email
@@ -55,41 +167,97 @@ def forgot_password_email(email):
     message = Message(subject,
                       recipients=[to_email],
                       body=content)
-    mail.send(message)
+    send_mail(message)
 
 
-@rq.job
+def chunks(query, column, size):
+    """
+    lists of up to size values of column from query, until it is empty
+
+    each chunk has to leave query before the next one is taken
+    """
+    while True:
+        values = [value for value, in
+                  query.with_entities(column).order_by(column).limit(size)]
+
+        if not values:
+            return
+
+        yield values
+
+
+def save_progress(job, progress):
+    if job is not None:
+        job.meta['progress'] = progress
+        job.save_meta()
+
+
+# the outcome stays readable at /jobs for a day
+@rq.job('bulk', result_ttl=24 * 60 * 60)
 def user_deletion(email, remove_content):
-    user = User.query.filter_by(email=email).one()
-    to_email = user.email
+    """
+    detach or tombstone the content of the user, then delete the user
 
-    # update content of posts and comments by user
-    # to change author to special 'deleted' account
-    deleted_message = '<p>[deleted]</p>'
-    special_account = User.query.filter_by(
-        email=current_app.config['DELETED_ACCOUNT_EMAIL']).one()
+    content is handled a chunk of USER_DELETION_CHUNK_SIZE rows at a time,
+    each in a transaction of its own, handled rows no longer belong to the
+    user so a retried job carries on where it stopped, progress is kept in
+    the job meta along with the total it counts up to
+    """
+    job = get_current_job()
+    progress = dict({'posts': 0, 'comments': 0, 'cheers': 0, 'deleted': False},
+                    **(job.meta.get('progress', {}) if job is not None else {}))
+    size = current_app.config['USER_DELETION_CHUNK_SIZE']
+    to_email = email
 
-    posts = Post.query.filter_by(author=user).all()
+    if not progress['deleted']:
+        user = User.query.filter_by(email=email).one()
+        cheers = db.session.query(userpostcheers).filter(userpostcheers.c.user_id == user.id)
 
-    for post in posts:
-        post.author = special_account
+        if 'total' not in progress:
+            progress['total'] = {
+                'posts': Post.query.filter(Post.author_id == user.id).count(),
+                'comments': Comment.query.filter(Comment.author_id == user.id).count(),
+                'cheers': cheers.count(),
+            }
+            save_progress(job, progress)
 
-        if remove_content:
-            post.content = deleted_message
+        # posts and comments stay without an author, as tombstones if the
+        # user asked for their content to be removed
+        for name, model in (('posts', Post), ('comments', Comment)):
+            values = {model.author_id: None}
 
-    comments = Comment.query.filter_by(author=user).all()
+            if remove_content:
+                values.update(tombstone(model))
 
-    for comment in comments:
-        comment.author = special_account
+            for ids in chunks(model.query.filter(model.author_id == user.id), model.id, size):
+                model.query \
+                    .filter(model.id.in_(ids)) \
+                    .update(values, synchronize_session=False)
+                db.session.commit()
 
-        if remove_content:
-            comment.content = deleted_message
+                progress[name] += len(ids)
+                save_progress(job, progress)
 
-    # delete the user account
-    db.session.delete(user)
+        for post_ids in chunks(cheers, userpostcheers.c.post_id, size):
+            db.session.execute(
+                userpostcheers.delete()
+                .where(userpostcheers.c.user_id == user.id)
+                .where(userpostcheers.c.post_id.in_(post_ids))
+            )
+            db.session.commit()
 
-    # sync the db
-    db.session.commit()
+            progress['cheers'] += len(post_ids)
+            save_progress(job, progress)
+
+        # delete the user account
+        db.session.delete(user)
+        db.session.commit()
+
+        progress['deleted'] = True
+        save_progress(job, progress)
+
+    # posts and comments across any number of courses changed
+    cache.bump('epoch')
 
     # finally, send an email to the user confirming account deletion
     subject = 'Scarlet Studies Account Deleted'
@@ -97,4 +265,4 @@ def user_deletion(email, remove_content):
     message = Message(subject,
                       recipients=[to_email],
                       body=content)
-    mail.send(message)
+    send_mail(message)
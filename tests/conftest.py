@@ -1,6 +1,8 @@
 import pytest
 from functools import namedtuple
+from sqlalchemy import event
 from ssapi import create_app
+from ssapi.cache import cache
 from ssapi.db import db, User
 from ssapi.praetorian import guard
 
@@ -9,10 +11,17 @@ from ssapi.praetorian import guard
 def app():
     app = create_app()
 
+    # cache in a local fake redis, emptied for every test, instead of the
+    # connection made while warming up
+    app.config['CACHE_CONNECTION_CLASS'] = 'fakeredis.FakeStrictRedis'
+    app.extensions['cache']['connection'] = None
+
     with app.app_context():
         db.drop_all()
         db.create_all()
 
+        cache.clear()
+
     return app
 
 
@@ -26,6 +35,27 @@ def runner(app):
     return app.test_cli_runner()
 
 
+@pytest.fixture
+def query_counter(app):
+    """
+    records every SQL statement sent to the database, clear it before the
+    code under test runs
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+
+    yield statements
+
+    event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
 @pytest.fixture
 def test_user(app):
     TestUser = namedtuple(
@@ -74,13 +104,3 @@ def another_test_user(app):
                         password=password,
                         id=user.id,
                         auth_headers=headers)
-
-
-@pytest.fixture
-def special_deleted_account(app):
-    with app.app_context():
-        db.session.add(User(email=app.config['DELETED_ACCOUNT_EMAIL'],
-                            password='42',
-                            is_verified=False))
-
-        db.session.commit()
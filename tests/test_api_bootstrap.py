@@ -0,0 +1,120 @@
+import pytest
+from datetime import datetime, date
+from flask_restplus import marshal
+from ssapi.db import db, Post, Course, Category, Semester
+
+from ssapi.apis.category import category_marshal_model
+from ssapi.apis.course import course_marshal_model
+from ssapi.apis.semester import semester_marshal_model
+
+
+@pytest.fixture
+def testdata_bootstrap(app, test_user):
+    with app.app_context():
+        categories = [Category(name='name%d' % n) for n in range(0, 3)]
+        courses = [Course(name='name%d' % n, offering_unit='ou%d' % n,
+                          subject='sb%d' % n, course_number='cn%d' % n)
+                   for n in range(0, 3)]
+        semesters = [Semester(year=2018 + n, season='fall') for n in range(0, 3)]
+
+        db.session.add_all(categories + courses + semesters)
+
+        for n in range(0, 3):
+            db.session.add(Post(title='title%d' % n,
+                                content='content%d' % n,
+                                timestamp=datetime(2018 + n, 1, 1),
+                                last_activity_at=datetime(2018 + n, 1, 1),
+                                due_date=date(2018 + n, 2, 3),
+                                author_id=test_user.id,
+                                course=courses[n],
+                                category=categories[n],
+                                semester=semesters[n]))
+
+        db.session.commit()
+
+        return {
+            'categories': marshal(categories, category_marshal_model),
+            'semesters': marshal(list(reversed(semesters)), semester_marshal_model),
+            'courses': marshal(courses, course_marshal_model)
+        }
+
+
+def test_bootstrap(app, client, test_user, testdata_bootstrap):
+    course = testdata_bootstrap['courses'][0]
+
+    rv = client.post('/users/courses/{}'.format(course['id']),
+                     headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    rv = client.get('/bootstrap/', headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    data = rv.get_json()
+
+    assert data['categories'] == testdata_bootstrap['categories']
+    assert data['semesters'] == testdata_bootstrap['semesters']
+    assert data['courses'] == [course]
+
+    # the same first page as the posts endpoint
+    assert data['posts'] == client.get('/posts/', headers=test_user.auth_headers).get_json()
+
+
+def test_bootstrap_posts_arguments(app, client, test_user, testdata_bootstrap):
+    rv = client.get('/bootstrap/?view=summary&sort=activity',
+                    headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert rv.get_json()['posts'] == client.get(
+        '/posts/?view=summary&sort=activity', headers=test_user.auth_headers).get_json()
+
+
+def test_bootstrap_not_modified(app, client, test_user, query_counter, testdata_bootstrap):
+    rv = client.get('/bootstrap/', headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert rv.headers['ETag']
+
+    del query_counter[:]
+
+    rv = client.get('/bootstrap/',
+                    headers={'If-None-Match': rv.headers['ETag'],
+                             **test_user.auth_headers})
+
+    assert rv.status_code == 304
+    assert rv.get_data() == b''
+    assert query_counter == []
+
+
+@pytest.mark.parametrize('change', ('course', 'post', 'category', 'semester'))
+def test_bootstrap_modified(app, client, test_user, testdata_bootstrap, change):
+    rv = client.get('/bootstrap/', headers=test_user.auth_headers)
+    etag = rv.headers['ETag']
+
+    if change == 'course':
+        rv = client.post('/users/courses/{}'.format(testdata_bootstrap['courses'][1]['id']),
+                         headers=test_user.auth_headers)
+
+        assert rv.status_code == 200
+    elif change == 'post':
+        rv = client.post('/posts/', headers=test_user.auth_headers, json={
+            'title': 'new',
+            'content': 'new',
+            'course': {'id': testdata_bootstrap['courses'][1]['id']},
+            'category': {'id': testdata_bootstrap['categories'][1]['id']},
+            'dueDate': '2018-02-03'
+        })
+
+        assert rv.status_code == 201
+    else:
+        with app.app_context():
+            db.session.add(Category(name='new') if change == 'category' else
+                           Semester(year=2030, season='spring'))
+            db.session.commit()
+
+    rv = client.get('/bootstrap/',
+                    headers={'If-None-Match': etag, **test_user.auth_headers})
+
+    assert rv.status_code == 200
+    assert rv.headers['ETag'] != etag
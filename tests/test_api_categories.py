@@ -39,3 +39,37 @@ def test_get_all_categories(app, client, test_user, categories_testdata):
 
     # confirm same data and order
     assert all(a == b for a, b in zip(categories_json, json_data))
+
+
+def test_get_all_categories_not_modified(app, client, test_user, categories_testdata):
+    rv = client.get('/categories/', headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert rv.headers['ETag']
+
+    rv = client.get('/categories/',
+                    headers={'If-None-Match': rv.headers['ETag'],
+                             **test_user.auth_headers})
+
+    assert rv.status_code == 304
+    assert rv.get_data() == b''
+
+    with app.app_context():
+        db.session.add(Category(name='new'))
+        db.session.commit()
+
+    changed = client.get('/categories/',
+                         headers={'If-None-Match': rv.headers['ETag'],
+                                  **test_user.auth_headers})
+
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != rv.headers['ETag']
+
+
+def test_get_all_categories_not_modified_requires_auth(app, client, test_user,
+                                                       categories_testdata):
+    rv = client.get('/categories/', headers=test_user.auth_headers)
+
+    rv = client.get('/categories/', headers={'If-None-Match': rv.headers['ETag']})
+
+    assert rv.status_code == 401
@@ -1,5 +1,6 @@
 import pytest
 from flask_restplus import marshal
+from sqlalchemy.exc import IntegrityError
 from ssapi.db import db, Course
 from ssapi.apis.course import course_marshal_model
 
@@ -87,3 +88,103 @@ def test_get_one_course(app, client, test_user, testdata_courses):
     api_course_json = rv.get_json()
 
     assert api_course_json == target_course
+
+
+def test_get_one_course_not_modified(app, client, test_user, testdata_courses):
+    url = '/courses/%s' % testdata_courses[0]['id']
+
+    rv = client.get(url, headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    rv = client.get(url, headers={'If-None-Match': rv.headers['ETag'],
+                                  **test_user.auth_headers})
+
+    assert rv.status_code == 304
+
+    # etags of other courses do not match
+    rv = client.get('/courses/%s' % testdata_courses[1]['id'],
+                    headers={'If-None-Match': rv.headers['ETag'],
+                             **test_user.auth_headers})
+
+    assert rv.status_code == 200
+
+
+@pytest.fixture
+def testdata_course_codes(app):
+    codes = (('21', '640', '135'), ('21', '640', '136'), ('21', '198', '111'),
+             ('01', '640', '135'), ('01', '640', '151'))
+
+    with app.app_context():
+        db.session.add_all([Course(name='course %s:%s:%s' % code, offering_unit=code[0],
+                                   subject=code[1], course_number=code[2])
+                            for code in codes])
+        db.session.commit()
+
+
+@pytest.mark.parametrize(
+    ('query', 'names'),
+    (
+        ('21:640:135', ['course 21:640:135']),
+        ('21:640', ['course 21:640:135', 'course 21:640:136']),
+        ('01:640', ['course 01:640:135', 'course 01:640:151']),
+        ('21:640:999', []),
+        # partial course numbers are not codes, but names
+        ('21:640:13x', []),
+    )
+)
+def test_get_courses_by_code(app, client, test_user, testdata_course_codes, query, names):
+    rv = client.get('/courses/?query=%s' % query, headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert [c['name'] for c in rv.get_json()] == names
+
+
+def test_course_codes_unique(app, testdata_course_codes):
+    with app.app_context():
+        db.session.add(Course(name='again', offering_unit='21', subject='640',
+                              course_number='135'))
+
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+
+        db.session.rollback()
+
+
+def test_autocomplete_courses(app, client, test_user, testdata_course_codes):
+    rv = client.get('/courses/autocomplete?query=21:6', headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert [c['name'] for c in rv.get_json()] == ['course 21:640:135', 'course 21:640:136']
+
+    rv = client.get('/courses/autocomplete?query=course&limit=1000',
+                    headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert len(rv.get_json()) == 5
+
+    rv = client.get('/courses/autocomplete', headers=test_user.auth_headers)
+
+    assert rv.status_code == 400
+
+
+def test_get_course_batch(app, client, test_user, testdata_courses):
+    ids = [testdata_courses[3]['id'], '9999', testdata_courses[0]['id'],
+           testdata_courses[3]['id']]
+
+    rv = client.get('/courses/batch?' + '&'.join('ids[]=%s' % id for id in ids),
+                    headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert rv.get_json() == {
+        'items': [testdata_courses[3], testdata_courses[0]],
+        'missing': [9999]
+    }
+
+
+@pytest.mark.parametrize(('query',), (('',), ('?ids[]=x',), ('?' + '&'.join(
+    'ids[]=%d' % n for n in range(101)),)))
+def test_get_course_batch_invalid(app, client, test_user, query):
+    rv = client.get('/courses/batch' + query, headers=test_user.auth_headers)
+
+    assert rv.status_code == 400
@@ -1,7 +1,11 @@
 import re
+import time
 from freezegun import freeze_time
 from datetime import date, timedelta
 
+from ssapi.cache import cache
+from ssapi.db import db, User
+from ssapi.praetorian import guard, shared_slots_key
 from ssapi.tasks import mail
 
 
@@ -114,3 +118,66 @@ def test_forgot_password(app, client, test_user):
 
             assert 'jwt' in json_data
             assert test_user.email == json_data['email']
+
+
+def test_login_rehashes_outdated_password(app, client, test_user):
+    with app.app_context():
+        user = User.query.get(test_user.id)
+        user.password = guard.pwd_ctx.hash(test_user.password, rounds=1000)
+        db.session.commit()
+
+    rv = client.post('/users/login',
+                     json={'email': test_user.email, 'password': test_user.password})
+
+    assert rv.status_code == 200
+
+    with app.app_context():
+        password = User.query.get(test_user.id).password
+
+        assert '$1000$' not in password
+        assert not guard.pwd_ctx.needs_update(password)
+        assert guard.pwd_ctx.verify(test_user.password, password)
+
+
+def test_login_busy(app, client, test_user):
+    app.config['PASSWORD_HASH_WAIT'] = 0
+
+    with app.app_context():
+        # every slot taken by other processes
+        for n in range(app.config['PASSWORD_HASH_CONCURRENCY']):
+            cache.connection.zadd(shared_slots_key(), time.time(), 'other%d' % n)
+
+    rv = client.post('/users/login',
+                     json={'email': test_user.email, 'password': test_user.password})
+
+    assert rv.status_code == 503
+
+    with app.app_context():
+        # until they are given up as dead
+        app.config['PASSWORD_HASH_SLOT_TIMEOUT'] = 0
+
+    rv = client.post('/users/login',
+                     json={'email': test_user.email, 'password': test_user.password})
+
+    assert rv.status_code == 200
+
+    with app.app_context():
+        assert cache.connection.zcard(shared_slots_key()) == 0
+
+
+def test_forgot_password_deduplicated(app, client, test_user):
+    with app.app_context():
+        with mail.record_messages() as outbox:
+            data = {
+                'email': test_user.email
+            }
+
+            first = client.post('/users/password/forgot',
+                                json=data)
+            second = client.post('/users/password/forgot',
+                                 json=data)
+
+            assert first.status_code == second.status_code == 200
+            assert first.get_json()['job_id'] == second.get_json()['job_id']
+
+            assert len(outbox) == 1
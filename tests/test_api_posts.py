@@ -1,7 +1,9 @@
 import pytest
+import json
 from datetime import datetime, date
 from flask_restplus import marshal
-from ssapi.db import db, Post, Course, Category, Semester, Comment
+from ssapi.cache import cache
+from ssapi.db import db, Post, Course, Category, Semester, Comment, User
 
 from ssapi.apis.post import post_marshal_model
 from ssapi.apis.category import category_marshal_model
@@ -40,6 +42,7 @@ def testdata_posts(app, test_user):
             post = Post(title='title%d' % n,
                         content='content%d' % n,
                         timestamp=datetime(2018 + n, 1, 1),
+                        last_activity_at=datetime(2018 + n, 1, 1),
                         due_date=date(2018 + n, 2, 3),
                         author_id=test_user.id,
                         course=courses[n],
@@ -132,6 +135,44 @@ def test_get_all_posts_sorted_by_latest_activity(app, client, test_user, testdat
     assert api_posts_json == test_posts_json
 
 
+def test_comment_bumps_post_activity(app, client, test_user, testdata_posts):
+    # oldest post by time
+    target_post = sorted(testdata_posts[0], key=lambda p: p['timestamp'])[0]
+
+    rv = client.post('/posts/{}/comments/'.format(target_post['id']),
+                     json={'content': 'bump'},
+                     headers=test_user.auth_headers)
+
+    assert rv.status_code == 201
+
+    # walk the whole activity feed
+    api_posts_json = []
+    cursor = ''
+
+    while cursor is not None:
+        rv = client.get('/posts/?sort=activity&cursor={}'.format(cursor),
+                        headers=test_user.auth_headers)
+
+        assert rv.status_code == 200
+
+        api_data_json = rv.get_json()
+        api_posts_json.extend(api_data_json['items'])
+        cursor = api_data_json['next_cursor']
+
+    api_post_ids = [p['id'] for p in api_posts_json]
+
+    # commented post appears once and is no longer last
+    assert api_post_ids.count(target_post['id']) == 1
+    assert api_post_ids[-1] != target_post['id']
+
+    # it is ranked by the comment, between newer and older posts
+    position = api_post_ids.index(target_post['id'])
+    newer = [p['timestamp'] for p in api_posts_json[:position]]
+    older = [p['timestamp'] for p in api_posts_json[position + 1:]]
+
+    assert all(a > b for a in newer for b in older)
+
+
 def test_get_all_posts_for_course(app, client, test_user, testdata_posts):
     test_posts_json = testdata_posts[0]
     target_course = testdata_posts[1][0]
@@ -222,6 +263,62 @@ def test_get_all_posts_by_search_title(app, client, test_user, testdata_posts):
     assert test_posts_json == api_posts_json
 
 
+@pytest.fixture
+def testdata_search_posts(app, test_user, testdata_posts):
+    posts, courses, categories, semesters = testdata_posts
+
+    with app.app_context():
+        contents = (
+            ('unrelated', '<p>eigenvalue</p>'),
+            ('eigenvalue', '<p>eigenvalue and another eigenvalue</p>'),
+            ('homework', '<p><strong>eigenvalue</strong> eigenvalue</p>'),
+        )
+
+        ids = []
+        for title, content in contents:
+            post = Post(title=title,
+                        content=content,
+                        author_id=test_user.id,
+                        course_id=courses[0]['id'],
+                        category_id=categories[0]['id'],
+                        semester_id=semesters[0]['id'])
+            db.session.add(post)
+            db.session.commit()
+            ids.append(str(post.id))
+
+        return ids
+
+
+def test_get_all_posts_by_search_relevance(app, client, test_user, testdata_search_posts):
+    unrelated, eigenvalue, homework = testdata_search_posts
+
+    rv = client.get('/posts/?query=eigenvalue&sort=relevance',
+                    headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    api_post_ids = [p['id'] for p in rv.get_json()['items']]
+
+    # title matches rank first, then by number of matches
+    assert api_post_ids == [eigenvalue, homework, unrelated]
+
+
+def test_get_all_posts_by_search_ignores_markup(app, client, test_user, testdata_search_posts):
+    rv = client.get('/posts/?query=strong',
+                    headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    assert rv.get_json()['items'] == []
+
+
+def test_get_all_posts_sorted_by_relevance_without_query(app, client, test_user, testdata_posts):
+    rv = client.get('/posts/?sort=relevance',
+                    headers=test_user.auth_headers)
+
+    assert rv.status_code == 400
+
+
 def test_get_all_posts_within_time_period(app, client, test_user, testdata_posts):
     test_posts_json = testdata_posts[0]
 
@@ -258,6 +355,15 @@ def test_get_all_posts_within_time_period(app, client, test_user, testdata_posts
     assert test_posts_json == api_posts_json
 
 
+def test_get_all_posts_start_date_inclusive(app, client, test_user, testdata_posts):
+    # the post of 2019 is due on 2019-02-03
+    rv = client.get('/posts/?start_date=2019-02-03&end_date=2019-02-04',
+                    headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert [p['due_date'] for p in rv.get_json()['items']] == ['2019-02-03']
+
+
 @pytest.mark.parametrize(
     ('page',),
     (
@@ -291,6 +397,70 @@ def test_get_all_posts_with_limit(app, client, test_user, page, testdata_posts):
     assert test_posts_json == api_posts_json
 
 
+@pytest.mark.parametrize(
+    ('sort',),
+    (
+        ('time',),
+        ('activity',),
+    )
+)
+def test_get_all_posts_by_cursor(app, client, test_user, sort, testdata_posts):
+    test_posts_json = testdata_posts[0]
+
+    # walk every page by following next_cursor
+    api_posts_json = []
+    cursor = ''
+
+    while cursor is not None:
+        rv = client.get('/posts/?sort={}&cursor={}'.format(sort, cursor),
+                        headers=test_user.auth_headers)
+
+        assert rv.status_code == 200
+
+        api_data_json = rv.get_json()
+
+        # pages hold 20 posts at most
+        assert len(api_data_json['items']) <= 20
+
+        api_posts_json.extend(api_data_json['items'])
+        cursor = api_data_json['next_cursor']
+
+    # no comments, so both sorts are by time
+    test_posts_json = sorted(
+        test_posts_json, key=lambda p: p['timestamp'], reverse=True)
+
+    assert test_posts_json == api_posts_json
+
+
+def test_get_all_posts_page_then_cursor(app, client, test_user, testdata_posts):
+    test_posts_json = testdata_posts[0]
+
+    # the first page by number hands out a cursor for the second page
+    rv = client.get('/posts/?page=1',
+                    headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    cursor = rv.get_json()['next_cursor']
+
+    rv = client.get('/posts/?cursor={}'.format(cursor),
+                    headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    test_posts_json = sorted(
+        test_posts_json, key=lambda p: p['timestamp'], reverse=True)
+
+    assert test_posts_json[20:40] == rv.get_json()['items']
+
+
+def test_get_all_posts_bad_cursor(app, client, test_user, testdata_posts):
+    rv = client.get('/posts/?cursor=garbage',
+                    headers=test_user.auth_headers)
+
+    assert rv.status_code == 400
+
+
 def test_add_post(app, client, test_user, testdata_posts):
     target_course = testdata_posts[1][0]
     target_category = testdata_posts[2][0]
@@ -410,6 +580,29 @@ def test_add_cheer(app, client, test_user, testdata_posts):
     assert all(json_data[k] == v for k, v in expected.items())
 
 
+def test_add_cheer_to_missing_post(app, client, test_user, testdata_posts):
+    target_post = testdata_posts[0][0]
+
+    rv = client.post('/posts/9999/cheers/',
+                     headers=test_user.auth_headers)
+
+    assert rv.status_code == 404
+
+    # nor to a deleted one
+    rv = client.delete('/posts/{}'.format(target_post['id']),
+                       headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    rv = client.post('/posts/{}/cheers/'.format(target_post['id']),
+                     headers=test_user.auth_headers)
+
+    assert rv.status_code == 404
+
+    with app.app_context():
+        assert Post.query.get(target_post['id']).cheers == []
+
+
 def test_get_one_post(app, client, test_user, testdata_posts):
     target_post = testdata_posts[0][0]
 
@@ -435,7 +628,6 @@ def test_fail_get_one_post(app, client, test_user, testdata_posts):
     assert rv.status_code == 404
 
 
-@pytest.mark.usefixtures('special_deleted_account')
 def test_delete_post(app, client, test_user, testdata_posts):
     target_post = testdata_posts[0][0]
 
@@ -450,6 +642,74 @@ def test_delete_post(app, client, test_user, testdata_posts):
     api_post_json = rv.get_json()
 
     assert '[deleted]' in api_post_json['content']
+    assert api_post_json['author'] == {'email': '[deleted]'}
+    assert api_post_json['title'] == target_post['title']
+
+    # kept as a tombstone
+    with app.app_context():
+        post = Post.query.get(target_post['id'])
+
+        assert post.is_deleted
+        assert post.deleted_at is not None
+        assert post.content == target_post['content']
+        assert post.author_id == test_user.id
+
+
+def test_delete_post_single_update(app, client, test_user, query_counter, testdata_posts):
+    target_post = testdata_posts[0][0]
+
+    # who is asking is known from earlier requests
+    client.get('/posts/?view=summary', headers=test_user.auth_headers)
+
+    del query_counter[:]
+
+    rv = client.delete('/posts/{}'.format(target_post['id']),
+                       headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    # the update, then loading the post to return
+    assert query_counter[0].startswith('UPDATE post SET')
+    assert not any(statement.startswith('SELECT') and 'FROM user' in statement
+                   for statement in query_counter)
+
+
+def test_delete_post_leaves_lists(app, client, test_user, testdata_posts):
+    target_post = testdata_posts[0][0]
+
+    rv = client.get('/posts/?with_total=true', headers=test_user.auth_headers)
+    total = rv.get_json()['total']
+
+    rv = client.delete('/posts/{}'.format(target_post['id']),
+                       headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    for view in ('full', 'summary'):
+        rv = client.get('/posts/?with_total=true&view=%s' % view,
+                        headers=test_user.auth_headers)
+        json_data = rv.get_json()
+
+        assert json_data['total'] == total - 1
+        assert target_post['id'] not in [p['id'] for p in json_data['items']]
+
+    rv = client.get('/posts/calendar?start_date=2018-01-01&end_date=2019-01-01&ids=true',
+                    headers=test_user.auth_headers)
+
+    assert int(target_post['id']) not in [id for day in rv.get_json() for id in day['posts']]
+
+    # but can still be looked at
+    rv = client.get('/posts/{}'.format(target_post['id']),
+                    headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert '[deleted]' in rv.get_json()['content']
+
+
+def test_delete_post_missing(app, client, test_user, testdata_posts):
+    rv = client.delete('/posts/424242', headers=test_user.auth_headers)
+
+    assert rv.status_code == 404
 
 
 def test_delete_post_not_author(app, client, another_test_user, testdata_posts):
@@ -472,6 +732,41 @@ def test_delete_post_not_author(app, client, another_test_user, testdata_posts):
     assert target_post == api_post_json
 
 
+def test_add_comment_to_missing_post(app, client, test_user, testdata_posts):
+    target_post = testdata_posts[0][0]
+
+    data = {
+        'content': '<p>Example comment content</p>'
+    }
+
+    rv = client.post('/posts/9999/comments/',
+                     json=data,
+                     headers=test_user.auth_headers)
+
+    assert rv.status_code == 404
+
+    # nor to a deleted one, which keeps its activity
+    rv = client.delete('/posts/{}'.format(target_post['id']),
+                       headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    with app.app_context():
+        last_activity_at = Post.query.get(target_post['id']).last_activity_at
+
+    rv = client.post('/posts/{}/comments/'.format(target_post['id']),
+                     json=data,
+                     headers=test_user.auth_headers)
+
+    assert rv.status_code == 404
+
+    with app.app_context():
+        post = Post.query.get(target_post['id'])
+
+        assert post.last_activity_at == last_activity_at
+        assert post.comments == []
+
+
 @pytest.fixture
 def testdata_delete_comment(app, test_user, testdata_posts):
     posts, courses, categories, semesters = testdata_posts
@@ -491,7 +786,6 @@ def testdata_delete_comment(app, test_user, testdata_posts):
         return marshal(post, post_marshal_model)
 
 
-@pytest.mark.usefixtures('special_deleted_account')
 def test_delete_comment(app, client, test_user, testdata_delete_comment):
     target_post = testdata_delete_comment
     target_comment = target_post['comments'][0]
@@ -507,6 +801,21 @@ def test_delete_comment(app, client, test_user, testdata_delete_comment):
     api_comment_json = api_post_json['comments'][0]
 
     assert '[deleted]' in api_comment_json['content']
+    assert api_comment_json['author'] == {'email': '[deleted]'}
+
+    # the rest of the thread is untouched
+    assert api_post_json['comments'][1:] == target_post['comments'][1:]
+
+
+def test_delete_comment_of_another_post(app, client, test_user, testdata_delete_comment):
+    target_post = testdata_delete_comment
+    target_comment = target_post['comments'][0]
+
+    rv = client.delete('/posts/{}/comments/{}'.format(int(target_post['id']) + 1,
+                                                      target_comment['id']),
+                       headers=test_user.auth_headers)
+
+    assert rv.status_code == 404
 
 
 def test_delete_comment_not_author(app, client, another_test_user, testdata_delete_comment):
@@ -527,3 +836,312 @@ def test_delete_comment_not_author(app, client, another_test_user, testdata_dele
     api_comment_json = api_post_json['comments'][0]
 
     assert target_comment['content'] == api_comment_json['content']
+
+
+@pytest.fixture
+def testdata_busy_posts(app, test_user, testdata_posts):
+    posts, courses, categories, semesters = testdata_posts
+
+    with app.app_context():
+        users = [User(email='busy%d@unittest.com' % n, password='42')
+                 for n in range(5)]
+
+        for post in Post.query.all():
+            post.cheers.extend(users)
+
+            for user in users:
+                db.session.add(Comment(content='comment', post=post, author=user))
+
+        db.session.commit()
+
+        return posts
+
+
+@pytest.mark.parametrize(
+    ('method', 'url', 'status_code', 'max_queries'),
+    (
+        # count, posts, cheers, comments
+        ('get', '/posts/', 200, 4),
+        ('get', '/posts/?cursor=', 200, 3),
+        ('get', '/posts/?with_total=false', 200, 3),
+        ('get', '/posts/{id}', 200, 3),
+        # count, posts, user, comment counts, cheer counts
+        ('get', '/posts/?view=summary', 200, 5),
+        # user, post, cheers, insert, reload
+        ('post', '/posts/{id}/cheers/', 201, 8),
+        ('post', '/posts/{id}/comments/', 201, 8),
+    )
+)
+def test_post_queries_bounded(app, client, test_user, query_counter, testdata_busy_posts,
+                              method, url, status_code, max_queries):
+    target_post = testdata_busy_posts[0]
+    url = url.format(id=target_post['id'])
+
+    del query_counter[:]
+
+    if method == 'get':
+        rv = client.get(url, headers=test_user.auth_headers)
+    else:
+        rv = client.post(url, json={'content': 'comment'},
+                         headers=test_user.auth_headers)
+
+    assert rv.status_code == status_code
+
+    # independent of the number of posts, comments and cheers
+    assert len(query_counter) <= max_queries
+
+
+def test_get_all_posts_summary(app, client, test_user, testdata_busy_posts):
+    test_posts_json = testdata_busy_posts
+    target_post = test_posts_json[0]
+
+    # cheer one post as the current user
+    rv = client.post('/posts/{}/cheers/'.format(target_post['id']),
+                     headers=test_user.auth_headers)
+
+    assert rv.status_code == 201
+
+    rv = client.get('/posts/?view=summary',
+                    headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    api_posts_json = rv.get_json()['items']
+
+    assert len(api_posts_json) == 20
+
+    for summary in api_posts_json:
+        # no embedded comments or cheers
+        assert 'comments' not in summary
+        assert 'cheers' not in summary
+
+        assert summary['comment_count'] == 5
+
+        if summary['id'] == target_post['id']:
+            assert summary['cheer_count'] == 6
+            assert summary['cheered']
+        else:
+            assert summary['cheer_count'] == 5
+            assert not summary['cheered']
+
+
+def test_get_all_posts_summary_excerpt(app, client, test_user, testdata_posts):
+    target_course = testdata_posts[1][0]
+    target_category = testdata_posts[2][0]
+
+    data = {
+        'title': 'long',
+        'content': '<p>{}</p>'.format(' '.join(['word'] * 100)),
+        'category': {
+            'id': target_category['id']
+        },
+        'course': {
+            'id': target_course['id']
+        },
+    }
+
+    rv = client.post('/posts/',
+                     json=data,
+                     headers=test_user.auth_headers)
+
+    assert rv.status_code == 201
+
+    rv = client.get('/posts/?view=summary&courses[]={}'.format(target_course['id']),
+                    headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    summary = [p for p in rv.get_json()['items'] if p['title'] == 'long'][0]
+
+    # plain text, cut at a word and marked as truncated
+    assert summary['excerpt'].startswith('word word')
+    assert summary['excerpt'].endswith(' word\u2026')
+    assert len(summary['excerpt']) <= 201
+
+
+def test_get_one_post_not_modified(app, client, test_user, query_counter, testdata_posts):
+    post_id = testdata_posts[0][0]['id']
+    url = '/posts/%s' % post_id
+
+    rv = client.get(url, headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    etag = rv.headers['ETag']
+
+    del query_counter[:]
+
+    rv = client.get(url, headers={'If-None-Match': etag, **test_user.auth_headers})
+
+    # answered from the version counters alone
+    assert rv.status_code == 304
+    assert rv.headers['ETag'] == etag
+    assert len(query_counter) == 0
+
+    rv = client.post('/posts/%s/cheers/' % post_id, headers=test_user.auth_headers)
+
+    assert rv.status_code == 201
+
+    rv = client.get(url, headers={'If-None-Match': etag, **test_user.auth_headers})
+
+    assert rv.status_code == 200
+    assert rv.headers['ETag'] != etag
+    assert len(rv.get_json()['cheers']) == 1
+
+
+def test_get_all_posts_without_total(app, client, test_user, query_counter, testdata_posts):
+    rv = client.get('/posts/?with_total=false', headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    json_data = rv.get_json()
+
+    assert json_data['total'] is None
+    assert len(json_data['items']) == 20
+    assert json_data['next_cursor'] is not None
+    assert not any('count(' in statement.lower() for statement in query_counter)
+
+    # the last page has no next page
+    rv = client.get('/posts/?with_total=false&page=3', headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert len(rv.get_json()['items']) == 10
+    assert rv.get_json()['next_cursor'] is None
+
+    # past the last page
+    rv = client.get('/posts/?with_total=false&page=4', headers=test_user.auth_headers)
+
+    assert rv.status_code == 404
+
+
+def test_get_all_posts_approximate_total(app, client, test_user, testdata_posts):
+    url = '/posts/?with_total=approximate&page={}'
+
+    rv = client.get(url.format(1), headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert rv.get_json()['total'] == 50
+
+    data = {
+        'title': 'title',
+        'content': '<p>content</p>',
+        'category': {'id': testdata_posts[2][0]['id']},
+        'course': {'id': testdata_posts[1][0]['id']},
+    }
+
+    rv = client.post('/posts/', json=data, headers=test_user.auth_headers)
+
+    assert rv.status_code == 201
+
+    # the stored total is served until it is refreshed
+    rv = client.get(url.format(1), headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert rv.get_json()['total'] == 50
+
+    # an old total queues a refresh, the jobs run synchronously in tests
+    with app.app_context():
+        for key in cache.connection.scan_iter(match=cache.key('total', '*')):
+            cache.connection.set(key, json.dumps({'total': 50, 'at': 0}))
+
+    rv = client.get(url.format(2), headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    rv = client.get(url.format(3), headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert rv.get_json()['total'] == 51
+
+
+@pytest.fixture
+def testdata_calendar(app, test_user, testdata_posts):
+    posts_json, courses_json, categories_json, semesters_json = testdata_posts
+
+    with app.app_context():
+        for n in range(6):
+            db.session.add(Post(title='due%d' % n,
+                                content='due%d' % n,
+                                due_date=date(2018, 2, 3 + n % 3),
+                                author_id=test_user.id,
+                                course_id=courses_json[n % 2]['id'],
+                                category_id=categories_json[0]['id'],
+                                semester_id=semesters_json[0]['id']))
+
+        db.session.commit()
+
+        return {p.id: p.due_date.isoformat()
+                for p in Post.query.filter(Post.due_date >= date(2018, 2, 3),
+                                           Post.due_date < date(2018, 2, 6))}
+
+
+def test_post_calendar(app, client, test_user, query_counter, testdata_calendar):
+    del query_counter[:]
+
+    rv = client.get('/posts/calendar?start_date=2018-02-03&end_date=2018-02-06',
+                    headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    # the fixture post of 2018 is due on 2018-02-03 as well
+    assert rv.get_json() == [
+        {'date': '2018-02-03', 'count': 3, 'posts': None},
+        {'date': '2018-02-04', 'count': 2, 'posts': None},
+        {'date': '2018-02-05', 'count': 2, 'posts': None},
+    ]
+
+    # one grouped query
+    assert len(query_counter) == 1
+
+
+def test_post_calendar_ids(app, client, test_user, testdata_posts, testdata_calendar):
+    course_id = testdata_posts[1][0]['id']
+
+    rv = client.get('/posts/calendar?start_date=2018-02-03&end_date=2018-02-05'
+                    '&ids=true&courses[]={}'.format(course_id),
+                    headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    days = rv.get_json()
+
+    assert [day['date'] for day in days] == ['2018-02-03', '2018-02-04']
+
+    for day in days:
+        assert day['count'] == len(day['posts'])
+        assert all(testdata_calendar[id] == day['date'] for id in day['posts'])
+
+
+@pytest.mark.parametrize(
+    ('query',),
+    (
+        ('start_date=2018-02-03',),
+        ('start_date=2018-02-03&end_date=2018-02-03',),
+        ('start_date=2018-02-03&end_date=2020-02-03',),
+        ('start_date=tomorrow&end_date=2018-02-03',),
+    )
+)
+def test_post_calendar_bad_window(app, client, test_user, query):
+    rv = client.get('/posts/calendar?' + query, headers=test_user.auth_headers)
+
+    assert rv.status_code == 400
+
+
+def test_get_post_batch(app, client, test_user, query_counter, testdata_busy_posts):
+    rv = client.get('/posts/', headers=test_user.auth_headers)
+    posts = rv.get_json()['items']
+    ids = [posts[5]['id'], posts[1]['id'], '9999', posts[0]['id']]
+
+    del query_counter[:]
+
+    rv = client.get('/posts/batch?' + '&'.join('ids[]=%s' % id for id in ids),
+                    headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert rv.get_json() == {
+        'items': [posts[5], posts[1], posts[0]],
+        'missing': [9999]
+    }
+
+    # posts, cheers, comments
+    assert len(query_counter) <= 3
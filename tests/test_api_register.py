@@ -1,5 +1,6 @@
 import pytest
 import re
+from ssapi.cache import cache
 from ssapi.db import User
 from ssapi.tasks import mail
 
@@ -72,6 +73,42 @@ def test_register(app, client):
             assert rv.status_code == 200
 
 
+def test_resend_deduplicated(app, client):
+    data = {
+        'email': 'example@fakerutgers.edu',
+        'password': 'password456'
+    }
+
+    rv = client.post('/users/register',
+                     json=data)
+
+    assert rv.status_code == 201
+
+    with app.app_context():
+        with mail.record_messages() as outbox:
+            job_ids = []
+
+            for _ in range(3):
+                rv = client.post('/users/register/resend',
+                                 json=data)
+
+                assert rv.status_code == 200
+                job_ids.append(rv.get_json()['job_id'])
+
+            # repeats within the cooldown return the job already queued
+            assert len(set(job_ids)) == 1
+            assert len(outbox) == 1
+
+            # once the cooldown is over it is sent again
+            cache.connection.delete(cache.key('jobs', 'verification_email', data['email']))
+
+            rv = client.post('/users/register/resend',
+                             json=data)
+
+            assert rv.get_json()['job_id'] != job_ids[0]
+            assert len(outbox) == 2
+
+
 def test_register_existing_user(app, client, test_user):
     # register payload
     data = {
@@ -41,3 +41,15 @@ def test_get_all_semesters(app, client, test_user, testdata_semesters):
 
     # confirm same data and order
     assert json_data == semesters_json
+
+
+def test_get_all_semesters_not_modified(app, client, test_user, testdata_semesters):
+    rv = client.get('/semesters/', headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    rv = client.get('/semesters/',
+                    headers={'If-None-Match': rv.headers['ETag'],
+                             **test_user.auth_headers})
+
+    assert rv.status_code == 304
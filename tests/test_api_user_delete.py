@@ -67,7 +67,6 @@ def testdata_posts(app, test_user):
         return posts_json, comments_json
 
 
-@pytest.mark.usefixtures('special_deleted_account')
 def test_user_account_delete_without_content(app, client, test_user, testdata_posts):
     posts_json, comments_json = testdata_posts
 
@@ -92,19 +91,20 @@ def test_user_account_delete_without_content(app, client, test_user, testdata_po
             # confirm user account deleted
             assert not User.query.get(test_user.id)
 
-            # confirm that posts and comments remain with different author
+            # confirm that posts and comments remain without an author
             for post in posts_json:
                 found = Post.query.get(post['id'])
                 assert found.content == post['content']
-                assert found.author.id != test_user.id
+                assert found.author_id is None
+                assert not found.is_deleted
 
             for comment in comments_json:
-                found = Post.query.get(post['id'])
-                assert found.content == post['content']
-                assert found.author.id != test_user.id
+                found = Comment.query.get(comment['id'])
+                assert found.content == comment['content']
+                assert found.author_id is None
+                assert not found.is_deleted
 
 
-@pytest.mark.usefixtures('special_deleted_account')
 def test_user_account_delete_with_content(app, client, test_user, testdata_posts):
     posts_json, comments_json = testdata_posts
 
@@ -129,14 +129,18 @@ def test_user_account_delete_with_content(app, client, test_user, testdata_posts
             # confirm user account deleted
             assert not User.query.get(test_user.id)
 
-            # confirm that post and comment content is updated
+            # confirm that posts and comments are tombstones
             for post in posts_json:
                 found = Post.query.get(post['id'])
-                assert '[deleted]' in found.content
+                assert found.is_deleted
+                assert found.deleted_at is not None
+                assert found.author_id is None
 
             for comment in comments_json:
-                found = Post.query.get(post['id'])
-                assert '[deleted]' in found.content
+                found = Comment.query.get(comment['id'])
+                assert found.is_deleted
+                assert found.deleted_at is not None
+                assert found.author_id is None
 
 
 def test_user_account_bad_password(app, client, test_user):
@@ -156,3 +160,41 @@ def test_user_account_bad_password(app, client, test_user):
 
         # assert no email sent
         assert len(outbox) == 0
+
+
+def test_user_account_delete_job(app, client, test_user, another_test_user, testdata_posts):
+    data = {
+        'password': test_user.password,
+        'remove_content': True
+    }
+
+    with mail.record_messages():
+        rv = client.post('/users/remove',
+                         json=data,
+                         headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    job_id = rv.get_json()['job_id']
+
+    # still readable with the token of the deleted account
+    rv = client.get('/jobs/{}'.format(job_id), headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    job = rv.get_json()
+
+    assert job['id'] == job_id
+    assert job['status'] == 'finished'
+    assert job['progress'] == {'posts': 10, 'comments': 10, 'cheers': 0, 'deleted': True,
+                               'total': {'posts': 10, 'comments': 10, 'cheers': 0}}
+    assert job['enqueued_at'] is not None
+
+    # nobody else's
+    rv = client.get('/jobs/{}'.format(job_id), headers=another_test_user.auth_headers)
+
+    assert rv.status_code == 404
+
+    rv = client.get('/jobs/missing', headers=another_test_user.auth_headers)
+
+    assert rv.status_code == 404
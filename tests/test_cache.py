@@ -0,0 +1,165 @@
+import pytest
+from datetime import datetime
+from ssapi.cache import cache
+from ssapi.db import db, Post, Course, Category, Semester
+
+
+@pytest.fixture
+def testdata_posts(app, test_user):
+    with app.app_context():
+        category = Category(name='category')
+        semester = Semester(year=2018, season='Fall')
+
+        courses = [Course(name='name%d' % n, offering_unit='ou%d' % n,
+                          subject='sb%d' % n, course_number='cn%d' % n)
+                   for n in range(2)]
+
+        posts = [Post(title='title%d' % n,
+                      content='content%d' % n,
+                      timestamp=datetime(2018, 1, 1 + n),
+                      author_id=test_user.id,
+                      course=courses[n % 2],
+                      category=category,
+                      semester=semester)
+                 for n in range(4)]
+
+        db.session.add_all(posts)
+        db.session.commit()
+
+        return [post.id for post in posts], [course.id for course in courses]
+
+
+def cache_stats(client, test_user):
+    rv = client.get('/metrics/cache', headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    return rv.get_json()
+
+
+def test_post_list_cached(app, client, test_user, query_counter, testdata_posts):
+    rv = client.get('/posts/', headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    del query_counter[:]
+
+    cached = client.get('/posts/', headers=test_user.auth_headers)
+
+    assert cached.status_code == 200
+    assert cached.get_json() == rv.get_json()
+
+    # served without touching the database
+    assert len(query_counter) == 0
+
+    assert cache_stats(client, test_user) == {'hits': 1, 'misses': 1}
+
+
+def test_post_cached(app, client, test_user, query_counter, testdata_posts):
+    post_ids, course_ids = testdata_posts
+
+    rv = client.get('/posts/%d' % post_ids[0], headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    del query_counter[:]
+
+    cached = client.get('/posts/%d' % post_ids[0], headers=test_user.auth_headers)
+
+    assert cached.status_code == 200
+    assert cached.get_json() == rv.get_json()
+    assert len(query_counter) == 0
+
+
+@pytest.mark.parametrize(
+    ('url',),
+    (
+        ('/posts/',),
+        ('/posts/?courses[]={course_id}',),
+        ('/posts/{post_id}',),
+    )
+)
+def test_comment_invalidates(app, client, test_user, testdata_posts, url):
+    post_ids, course_ids = testdata_posts
+    url = url.format(post_id=post_ids[0], course_id=course_ids[0])
+
+    rv = client.get(url, headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    rv = client.post('/posts/%d/comments/' % post_ids[0],
+                     json={'content': 'fresh'},
+                     headers=test_user.auth_headers)
+
+    assert rv.status_code == 201
+
+    rv = client.get(url, headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert 'fresh' in rv.get_data(as_text=True)
+
+
+def test_other_course_keeps_cache(app, client, test_user, testdata_posts):
+    post_ids, course_ids = testdata_posts
+    url = '/posts/?courses[]=%d' % course_ids[1]
+
+    client.get(url, headers=test_user.auth_headers)
+
+    # comment on a post of the other course
+    rv = client.post('/posts/%d/comments/' % post_ids[0],
+                     json={'content': 'elsewhere'},
+                     headers=test_user.auth_headers)
+
+    assert rv.status_code == 201
+
+    client.get(url, headers=test_user.auth_headers)
+
+    assert cache_stats(client, test_user)['hits'] == 1
+
+
+def test_versions_expire(app, client, test_user, testdata_posts):
+    app.config['CACHE_VERSION_TIMEOUT'] = 600
+
+    rv = client.get('/posts/100000', headers=test_user.auth_headers)
+
+    assert rv.status_code == 404
+
+    with app.app_context():
+        keys = cache.connection.keys(cache.key('version', '*'))
+
+        # none of them permanent, even for posts that do not exist
+        assert all(cache.connection.ttl(key) > 0 for key in keys)
+        assert 0 < cache.connection.ttl(cache.key('version', 'post:100000')) <= 600
+
+        # reading a version puts its expiry off again
+        cache.connection.expire(cache.key('version', 'epoch'), 5)
+        cache.versions('epoch')
+
+        assert cache.connection.ttl(cache.key('version', 'epoch')) > 5
+
+        # and so does bumping it
+        cache.bump('posts')
+
+        assert 0 < cache.connection.ttl(cache.key('version', 'posts')) <= 600
+
+
+@pytest.mark.parametrize(('url',), (('/posts/?courses[]=zz0',), ('/posts/?categories[]=zz0',)))
+def test_invalid_ids_rejected(app, client, test_user, url):
+    rv = client.get(url, headers=test_user.auth_headers)
+
+    assert rv.status_code == 400
+
+    with app.app_context():
+        assert not cache.connection.keys(cache.key('version', 'course:zz0'))
+
+
+def test_cache_unavailable(app, client, test_user, testdata_posts):
+    # nothing listens there
+    app.config['CACHE_CONNECTION_CLASS'] = 'redis.StrictRedis'
+    app.config['CACHE_REDIS_URL'] = 'redis://localhost:1/0'
+    app.extensions['cache']['connection'] = None
+
+    rv = client.get('/posts/', headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert len(rv.get_json()['items']) == 4
@@ -0,0 +1,155 @@
+import pytest
+from sqlalchemy import asc
+from ssapi.cache import cache
+from ssapi.catalog import catalog, CourseIndex
+from ssapi.db import db, Course
+
+
+@pytest.fixture
+def testdata_catalog(app):
+    names = ('Calc I', 'Calc II', 'Calculus for Business', 'Intro to Computer Science',
+             'Linear Algebra', 'Data Structures', 'algorithms', 'Ab', 'Computer Architecture')
+
+    with app.app_context():
+        db.session.add_all([Course(name=name, offering_unit='01', subject='198',
+                                   course_number='%03d' % n)
+                            for n, name in enumerate(names)])
+        db.session.commit()
+
+
+@pytest.mark.parametrize(
+    ('query', 'limit'),
+    (
+        ('', 10),
+        ('', 3),
+        ('calc', 10),
+        ('CALC', 2),
+        ('al', 10),
+        ('computer', 10),
+        ('r a', 10),
+        ('b', 10),
+        ('zzz', 10),
+        ('Ab', 10),
+        ('calc', 0),
+    )
+)
+def test_index_matches_sql(app, testdata_catalog, query, limit):
+    with app.app_context():
+        expected = Course.query \
+            .filter(Course.name.like('%{}%'.format(query))) \
+            .order_by(asc(Course.name)) \
+            .all()
+
+        # sqlite orders case sensitively, mysql and the index do not
+        expected = sorted(expected, key=lambda c: c.name.lower())[:limit]
+
+        found = catalog.index.search(query, limit)
+
+        assert [c['id'] for c in found] == [c.id for c in expected]
+
+
+def indexed(*names, popularity=None):
+    popularity = popularity or {}
+
+    return CourseIndex([{'id': n, 'name': name, 'offering_unit': '01', 'subject': '198',
+                         'course_number': '%03d' % n, 'popularity': popularity.get(name, 0)}
+                        for n, name in enumerate(names, 1)])
+
+
+def test_index_trigrams():
+    index = indexed('Calc I', 'Linear Algebra')
+
+    assert index.postings['cal'] == [0]
+    assert index.postings['alg'] == [1]
+    assert [c['name'] for c in index.search('i', 10)] == ['Calc I', 'Linear Algebra']
+
+
+def test_search_without_queries(app, client, test_user, query_counter, testdata_catalog):
+    rv = client.get('/courses/?query=calc', headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+
+    del query_counter[:]
+
+    rv = client.get('/courses/?query=comp', headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert [c['name'] for c in rv.get_json()] == ['Computer Architecture',
+                                                  'Intro to Computer Science']
+    assert len(query_counter) == 0
+
+
+def test_catalog_warm(app, client, test_user, query_counter, testdata_catalog):
+    catalog.warm(app)
+
+    del query_counter[:]
+
+    rv = client.get('/courses/?query=comp', headers=test_user.auth_headers)
+
+    assert len(rv.get_json()) == 2
+    assert len(query_counter) == 0
+
+
+def test_index_rebuilt_on_commit(app, client, test_user, testdata_catalog):
+    rv = client.get('/courses/?query=calc', headers=test_user.auth_headers)
+
+    assert len(rv.get_json()) == 3
+
+    with app.app_context():
+        db.session.add(Course(name='Multivariable Calculus', offering_unit='01',
+                              subject='640', course_number='251'))
+        db.session.commit()
+
+    rv = client.get('/courses/?query=calc', headers=test_user.auth_headers)
+
+    assert 'Multivariable Calculus' in [c['name'] for c in rv.get_json()]
+
+
+def test_index_rebuilt_on_version_change(app, testdata_catalog):
+    with app.app_context():
+        index = catalog.index
+
+        assert catalog.index is index
+
+        # another process changed the catalog
+        cache.bump('catalog')
+
+        assert catalog.index is index
+
+        app.config['CATALOG_CHECK_INTERVAL'] = 0
+
+        assert catalog.index is not index
+
+
+def test_autocomplete_ranking():
+    index = indexed('Advanced Calculus', 'Calculus I', 'Calc Lab', 'Precalculus',
+                    'Business Calculus', 'Calculus II',
+                    popularity={'Calculus II': 50, 'Business Calculus': 100})
+
+    # name prefixes by popularity then name, then word prefixes by
+    # popularity then name, never the middle of a word
+    assert [c['name'] for c in index.autocomplete('calc', 10)] == [
+        'Calculus II', 'Calc Lab', 'Calculus I', 'Business Calculus', 'Advanced Calculus']
+    assert [c['name'] for c in index.autocomplete('  CALCULUS  i ', 10)] == [
+        'Calculus II', 'Calculus I']
+    assert [c['name'] for c in index.autocomplete('ca', 2)] == ['Calculus II', 'Calc Lab']
+    assert index.autocomplete('', 10) == []
+    assert index.autocomplete('lculus', 10) == []
+
+
+def test_autocomplete_codes():
+    index = CourseIndex([
+        {'id': 1, 'name': 'a', 'offering_unit': '01', 'subject': '198',
+         'course_number': '111', 'popularity': 1},
+        {'id': 2, 'name': 'b', 'offering_unit': '01', 'subject': '198',
+         'course_number': '112', 'popularity': 5},
+        {'id': 3, 'name': 'c', 'offering_unit': '01', 'subject': '640',
+         'course_number': '135', 'popularity': 9},
+        {'id': 4, 'name': 'd', 'offering_unit': '21', 'subject': '198',
+         'course_number': '111', 'popularity': 0},
+    ])
+
+    assert [c['id'] for c in index.autocomplete('01:198:11', 10)] == [2, 1]
+    assert [c['id'] for c in index.autocomplete('01:', 10)] == [3, 2, 1]
+    assert [c['id'] for c in index.autocomplete('01:198:111', 10)] == [1]
+    assert [c['id'] for c in index.autocomplete('2', 10)] == [4]
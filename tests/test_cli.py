@@ -0,0 +1,132 @@
+import io
+import json
+import pytest
+from ssapi.cli import iter_json_array, worker_queues
+from ssapi.db import db, Course
+
+
+def write_catalog(tmpdir, name, courses):
+    path = tmpdir.join(name)
+    path.write(json.dumps(courses, indent=2))
+
+    return str(path)
+
+
+def course(offering_unit, subject, course_number, name):
+    return {'offering_unit': offering_unit, 'subject': subject,
+            'course_number': course_number, 'name': name}
+
+
+@pytest.mark.parametrize(('chunk_size',), ((1,), (7,), (1 << 16,)))
+def test_iter_json_array(chunk_size):
+    items = [{'name': 'a, ]{'}, {'name': 'b'}, {'nested': [1, {'c': 2}]}]
+
+    assert list(iter_json_array(io.StringIO(json.dumps(items)), chunk_size)) == items
+    assert list(iter_json_array(io.StringIO(' [ ] '), chunk_size)) == []
+
+
+@pytest.mark.parametrize(('text',), (('{}',), ('[{}',), ('[{} {}]',), ('[{"a": }]',)))
+def test_iter_json_array_invalid(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), 4))
+
+
+def test_worker_queues():
+    queues = ['high', 'default', 'bulk']
+
+    assert worker_queues(queues, 3, 1) == [['high', 'default'], queues, queues]
+    assert worker_queues(queues, 2, 2) == [['high', 'default'], ['high', 'default']]
+    assert worker_queues(queues, 1, 0) == [queues]
+
+
+def test_import_courses(app, runner, tmpdir):
+    first = write_catalog(tmpdir, 'nb.json', [
+        course('01', '198', '111', 'INTRO COMPUTER SCI'),
+        course('01', '640', '135', 'CALCULUS I'),
+        course('22', '010', '577', 'ACCTG FOR MGRS'),
+    ])
+    second = write_catalog(tmpdir, 'nk.json', [
+        course('21', '640', '135', 'CALCULUS I'),
+        course('22', '010', '577', 'ACCTG FOR MGRS'),
+    ])
+
+    result = runner.invoke(args=['import-courses', first, second])
+
+    assert result.exit_code == 0, result.output
+    assert 'Inserted 4, updated 0, retired 0, unchanged 0' in result.output
+    assert '1 duplicated codes' in result.output
+
+    # importing again changes nothing
+    result = runner.invoke(args=['import-courses', first, second])
+
+    assert result.exit_code == 0, result.output
+    assert 'Inserted 0, updated 0, retired 0, unchanged 4' in result.output
+
+    with app.app_context():
+        assert Course.query.count() == 4
+
+
+def test_import_courses_next_term(app, runner, tmpdir):
+    with app.app_context():
+        db.session.add_all([
+            Course(name='INTRO COMPUTER SCI', offering_unit='01', subject='198',
+                   course_number='111'),
+            Course(name='CALC I', offering_unit='01', subject='640', course_number='135'),
+            Course(name='DISCONTINUED', offering_unit='01', subject='640', course_number='999'),
+            Course(name='OTHER CAMPUS', offering_unit='21', subject='640', course_number='135'),
+        ])
+        db.session.commit()
+
+    path = write_catalog(tmpdir, 'next.json', [
+        course('01', '198', '111', 'INTRO COMPUTER SCI'),
+        course('01', '640', '135', 'CALCULUS I'),
+        course('01', '640', '151', 'CALCULUS I FOR MATH/PHYS'),
+    ])
+
+    result = runner.invoke(args=['import-courses', '--dry-run', '--retire-missing', path])
+
+    assert result.exit_code == 0, result.output
+    assert 'Inserted 1, updated 1, retired 1, unchanged 1' in result.output
+
+    with app.app_context():
+        assert Course.query.count() == 4
+
+    result = runner.invoke(args=['import-courses', '--retire-missing', path])
+
+    assert result.exit_code == 0, result.output
+    assert 'Inserted 1, updated 1, retired 1, unchanged 1' in result.output
+
+    with app.app_context():
+        courses = {c.course_number if c.offering_unit == '01' else c.name: c
+                   for c in Course.query}
+
+        assert courses['135'].name == 'CALCULUS I'
+        assert courses['151'].is_retired is False
+        assert courses['999'].is_retired is True
+        # other offering units are left alone
+        assert courses['OTHER CAMPUS'].is_retired is False
+
+
+def test_import_courses_searchable(app, runner, client, test_user, tmpdir):
+    rv = client.get('/courses/?query=calc', headers=test_user.auth_headers)
+
+    assert rv.get_json() == []
+
+    path = write_catalog(tmpdir, 'nb.json', [course('01', '640', '135', 'CALCULUS I')])
+
+    result = runner.invoke(args=['import-courses', path])
+
+    assert result.exit_code == 0, result.output
+
+    rv = client.get('/courses/?query=calc', headers=test_user.auth_headers)
+
+    assert [c['name'] for c in rv.get_json()] == ['CALCULUS I']
+
+
+def test_import_courses_invalid(app, runner, tmpdir):
+    path = write_catalog(tmpdir, 'bad.json', [{'name': 'no code'}])
+
+    result = runner.invoke(args=['import-courses', path])
+
+    assert result.exit_code != 0
+    assert 'invalid course catalog' in result.output
@@ -1,5 +1,6 @@
 import pytest
 from datetime import date
+from sqlalchemy import inspect
 from sqlalchemy.exc import IntegrityError
 from ssapi.db import db, User, Course, Category, Semester, Post, Comment
 
@@ -284,6 +285,16 @@ def test_valid_post_model(app):
 # TODO test invalid
 
 
+def test_post_search_index_mysql_only(app):
+    with app.app_context():
+        is_mysql = db.engine.dialect.name == 'mysql'
+        indexes = [index['name'] for index in inspect(db.engine).get_indexes('post')]
+
+    # elsewhere search uses LIKE, a plain index over all of search_text is no use
+    assert ('ix_post_search_text' in indexes) == is_mysql
+    assert 'ix_post_is_deleted_timestamp' in indexes
+
+
 ################
 # Comment Model
 ##############
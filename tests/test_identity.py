@@ -0,0 +1,68 @@
+import pytest
+from ssapi.db import db, User
+from ssapi.identity import identify
+from ssapi.praetorian import guard
+
+
+def user_queries(statements):
+    return [s for s in statements if 'FROM user' in s]
+
+
+@pytest.fixture
+def testdata_identity(app, test_user):
+    # a page of summaries is cached per user and arguments, every page asked
+    # for below misses the response cache
+    client = app.test_client()
+    client.get('/posts/?view=summary', headers=test_user.auth_headers)
+
+
+def test_reads_without_user_queries(app, client, test_user, query_counter,
+                                    testdata_identity):
+    del query_counter[:]
+
+    for sort in ('time', 'activity'):
+        rv = client.get('/posts/?view=summary&sort=%s' % sort,
+                        headers=test_user.auth_headers)
+
+        assert rv.status_code == 200
+
+    assert query_counter
+    assert user_queries(query_counter) == []
+
+
+def test_identity_forgotten_on_verification(app, test_user):
+    with app.app_context():
+        assert identify(test_user.email).is_verified
+
+        User.query.get(test_user.id).is_verified = False
+        db.session.commit()
+
+        assert not identify(test_user.email).is_verified
+
+
+def test_identity_kept_on_rollback(app, test_user):
+    with app.app_context():
+        identify(test_user.email)
+
+        User.query.get(test_user.id).is_verified = False
+        db.session.rollback()
+
+        assert identify(test_user.email).is_verified
+
+
+def test_identity_forgotten_on_deletion(app, test_user):
+    with app.app_context():
+        identify(test_user.email)
+
+        db.session.delete(User.query.get(test_user.id))
+        db.session.commit()
+
+        assert identify(test_user.email) is None
+
+        # registering again is a new user under the same email
+        user = User(email=test_user.email, password=guard.encrypt_password('password123'),
+                    is_verified=True)
+        db.session.add(user)
+        db.session.commit()
+
+        assert identify(test_user.email).id == user.id
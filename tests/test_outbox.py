@@ -0,0 +1,252 @@
+import pytest
+import smtplib
+from flask_mail import Connection, Message
+from rq.timeouts import JobTimeoutException
+from ssapi.cache import cache
+from ssapi.outbox import Outbox, outbox_key
+from ssapi.tasks import deliver_mail, mail, send_mail
+
+
+class FakeSMTP(object):
+    """
+    stands in for smtplib.SMTP, refusing the recipients in refused with
+    their error and answering NOOP with noop_code
+    """
+    connections = 0
+
+    def __init__(self, refused, noop_code):
+        FakeSMTP.connections += 1
+        self.refused = refused
+        self.noop_code = noop_code
+        self.sent = []
+        self.noops = 0
+
+    def sendmail(self, sender, recipients, message, *options):
+        for recipient in recipients:
+            if recipient in self.refused:
+                raise self.refused[recipient]
+
+        self.sent.extend(recipients)
+
+    def noop(self):
+        self.noops += 1
+        return self.noop_code, b'OK'
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def smtp(app, monkeypatch):
+    """
+    every smtp session opened, with the refusals and NOOP answer they use
+    """
+    sessions = []
+    settings = {'refused': {}, 'noop_code': 250}
+
+    def configure_host(connection):
+        host = FakeSMTP(settings['refused'], settings['noop_code'])
+        sessions.append(host)
+        return host
+
+    monkeypatch.setattr(Connection, 'configure_host', configure_host)
+    app.extensions['mail'].suppress = False
+
+    return sessions, settings
+
+
+def queue_messages(app, count):
+    with app.app_context():
+        outbox = Outbox(mail, cache.connection)
+
+        for n in range(count):
+            outbox.put(Message('subject', recipients=['user%d@rutgers.edu' % n], body='body'))
+
+
+def pending(app):
+    """
+    the numbers of messages queued, in the processing list and to retry
+    """
+    with app.app_context():
+        return (cache.connection.llen(outbox_key('queued')),
+                cache.connection.llen(outbox_key('processing')),
+                cache.connection.zcard(outbox_key('retries')))
+
+
+def retries(app):
+    with app.app_context():
+        return cache.connection.zrange(outbox_key('retries'), 0, -1)
+
+
+def test_send_mail_delivers(app):
+    with app.app_context(), mail.record_messages() as outbox:
+        send_mail(Message('subject', recipients=['user@rutgers.edu'], body='body'))
+
+        assert [m.recipients for m in outbox] == [['user@rutgers.edu']]
+        assert cache.connection.llen(outbox_key('queued')) == 0
+
+
+def test_send_mail_queues_one_job(app, monkeypatch):
+    queued = []
+    monkeypatch.setattr(deliver_mail, 'queue', lambda: queued.append(1))
+
+    with app.app_context():
+        for n in range(5):
+            send_mail(Message('subject', recipients=['user%d@rutgers.edu' % n], body='body'))
+
+        assert len(queued) == 1
+        assert cache.connection.llen(outbox_key('queued')) == 5
+
+
+def test_deliver_in_batches_over_one_session(app, smtp):
+    sessions, settings = smtp
+    app.config['MAIL_BATCH_SIZE'] = 100
+    queue_messages(app, 250)
+
+    with app.app_context():
+        job = deliver_mail.queue()
+
+        assert job.result == {'delivered': 250, 'retried': 0}
+
+    assert len(sessions) == 1
+    assert len(sessions[0].sent) == 250
+    # health checked before every batch after the first
+    assert sessions[0].noops == 2
+
+
+def test_unhealthy_session_reopened(app, smtp):
+    sessions, settings = smtp
+    app.config['MAIL_BATCH_SIZE'] = 10
+    settings['noop_code'] = 421
+    queue_messages(app, 25)
+
+    with app.app_context():
+        assert deliver_mail.queue().result == {'delivered': 25, 'retried': 0}
+
+    assert [len(session.sent) for session in sessions] == [10, 10, 5]
+
+
+def test_transient_failure_retried_with_backoff(app, smtp):
+    sessions, settings = smtp
+    app.config['MAIL_RETRY_DELAY'] = 60
+    settings['refused']['user1@rutgers.edu'] = smtplib.SMTPServerDisconnected('gone')
+    queue_messages(app, 3)
+
+    with app.app_context():
+        assert deliver_mail.queue().result == {'delivered': 2, 'retried': 1}
+
+        # the rest went out over a new session
+        assert [session.sent for session in sessions] == [['user0@rutgers.edu'],
+                                                          ['user2@rutgers.edu']]
+
+        [(item, due)] = cache.connection.zrange(outbox_key('retries'), 0, -1, withscores=True)
+        assert b'"attempts": 1' in item
+
+        # not before it is due
+        assert deliver_mail.queue().result == {'delivered': 0, 'retried': 0}
+
+        # then again, with twice the delay if it fails again
+        cache.connection.zadd(outbox_key('retries'), 0, item)
+        assert deliver_mail.queue().result == {'delivered': 0, 'retried': 1}
+
+        [(item, next_due)] = cache.connection.zrange(outbox_key('retries'), 0, -1,
+                                                     withscores=True)
+        assert b'"attempts": 2' in item
+        assert next_due - due == pytest.approx(60, abs=5)
+
+        del settings['refused']['user1@rutgers.edu']
+        cache.connection.zadd(outbox_key('retries'), 0, item)
+        assert deliver_mail.queue().result == {'delivered': 1, 'retried': 0}
+
+    assert retries(app) == []
+
+
+def test_retries_given_up(app, smtp):
+    sessions, settings = smtp
+    app.config['MAIL_MAX_ATTEMPTS'] = 2
+    settings['refused']['user0@rutgers.edu'] = smtplib.SMTPRecipientsRefused(
+        {'user0@rutgers.edu': (450, b'mailbox busy')})
+    queue_messages(app, 1)
+
+    with app.app_context():
+        deliver_mail.queue()
+
+        [item] = cache.connection.zrange(outbox_key('retries'), 0, -1)
+        cache.connection.zadd(outbox_key('retries'), 0, item)
+
+        assert deliver_mail.queue().result == {'delivered': 0, 'retried': 1}
+
+    assert retries(app) == []
+
+
+def test_permanent_failure_dropped(app, smtp):
+    sessions, settings = smtp
+    settings['refused']['user0@rutgers.edu'] = smtplib.SMTPRecipientsRefused(
+        {'user0@rutgers.edu': (550, b'no such user')})
+    queue_messages(app, 2)
+
+    with app.app_context():
+        assert deliver_mail.queue().result == {'delivered': 1, 'retried': 0}
+
+    assert retries(app) == []
+
+
+def test_server_unavailable(app, monkeypatch):
+    def configure_host(connection):
+        raise ConnectionRefusedError()
+
+    monkeypatch.setattr(Connection, 'configure_host', configure_host)
+    app.extensions['mail'].suppress = False
+    queue_messages(app, 3)
+
+    with app.app_context():
+        assert deliver_mail.queue().result == {'delivered': 0, 'retried': 3}
+
+    assert len(retries(app)) == 3
+
+
+def test_unexpected_failure_retried(app, smtp):
+    sessions, settings = smtp
+    settings['refused']['user0@rutgers.edu'] = UnicodeEncodeError('ascii', 'é', 0, 1, 'no')
+    queue_messages(app, 3)
+
+    with app.app_context():
+        assert deliver_mail.queue().result == {'delivered': 2, 'retried': 1}
+
+    # the failed message is kept for a retry, the rest delivered
+    assert pending(app) == (0, 0, 1)
+    assert [session.sent for session in sessions] == [[], ['user1@rutgers.edu',
+                                                           'user2@rutgers.edu']]
+
+
+def test_interrupted_drain_recovered(app, smtp):
+    sessions, settings = smtp
+    settings['refused']['user1@rutgers.edu'] = JobTimeoutException('out of time')
+    queue_messages(app, 3)
+
+    with app.app_context():
+        with pytest.raises(JobTimeoutException):
+            Outbox(mail, cache.connection).drain()
+
+        # what was taken and not sent waits in the processing list
+        assert pending(app) == (0, 2, 0)
+
+        del settings['refused']['user1@rutgers.edu']
+
+        assert deliver_mail.queue().result == {'delivered': 2, 'retried': 0}
+
+    assert pending(app) == (0, 0, 0)
+    assert [session.sent for session in sessions] == [['user0@rutgers.edu'],
+                                                      ['user1@rutgers.edu',
+                                                       'user2@rutgers.edu']]
+
+
+def test_one_drain_at_a_time(app, smtp):
+    queue_messages(app, 2)
+
+    with app.app_context():
+        cache.connection.set(outbox_key('draining'), 'other', ex=60)
+
+        assert Outbox(mail, cache.connection).drain() == (0, 0)
+
+    assert pending(app) == (2, 0, 0)
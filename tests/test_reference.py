@@ -0,0 +1,110 @@
+import pytest
+from ssapi.cache import cache
+from ssapi.db import db, Category, Course, Semester
+from ssapi.reference import reference
+
+
+@pytest.fixture
+def testdata_reference(app):
+    with app.app_context():
+        db.session.add_all([Category(name='homework'), Category(name='exam'),
+                            Semester(year=2018, season='spring'),
+                            Semester(year=2018, season='fall'),
+                            Course(name='course', offering_unit='01', subject='198',
+                                   course_number='111')])
+        db.session.commit()
+
+
+def test_reference_endpoints_without_queries(app, client, test_user, query_counter,
+                                             testdata_reference):
+    client.get('/categories/', headers=test_user.auth_headers)
+
+    del query_counter[:]
+
+    rv = client.get('/categories/', headers=test_user.auth_headers)
+
+    assert [c['name'] for c in rv.get_json()] == ['homework', 'exam']
+
+    rv = client.get('/semesters/', headers=test_user.auth_headers)
+
+    assert [s['season'] for s in rv.get_json()] == ['fall', 'spring']
+
+    assert len(query_counter) == 0
+
+
+def test_new_post_without_reference_queries(app, client, test_user, query_counter,
+                                            testdata_reference):
+    with app.app_context():
+        category_id = reference.categories()[1]['id']
+        course_id = Course.query.one().id
+
+    del query_counter[:]
+
+    rv = client.post('/posts/',
+                     json={'title': 'title', 'content': 'content',
+                           'category': {'id': category_id}, 'course': {'id': course_id}},
+                     headers=test_user.auth_headers)
+
+    assert rv.status_code == 201
+    assert rv.get_json()['category']['name'] == 'exam'
+    assert rv.get_json()['semester']['season'] == 'fall'
+
+    assert not any('FROM category' in statement or 'FROM semester' in statement
+                   for statement in query_counter)
+
+
+def test_new_post_unknown_category(app, client, test_user, testdata_reference):
+    with app.app_context():
+        course_id = Course.query.one().id
+
+    for category_id in (9999, 'x'):
+        rv = client.post('/posts/',
+                         json={'title': 'title', 'content': 'content',
+                               'category': {'id': category_id}, 'course': {'id': course_id}},
+                         headers=test_user.auth_headers)
+
+        assert rv.status_code == 400
+
+
+def test_reference_reloaded_on_commit(app, testdata_reference):
+    with app.app_context():
+        assert reference.current_semester()['season'] == 'fall'
+
+        db.session.add(Semester(year=2019, season='spring'))
+        db.session.commit()
+
+        assert reference.current_semester()['year'] == 2019
+
+
+def test_reference_reloaded_on_version_change(app, testdata_reference):
+    with app.app_context():
+        value = reference.value
+
+        # another process changed the reference data
+        cache.bump('reference')
+
+        assert reference.value is value
+
+        app.config['REFERENCE_CHECK_INTERVAL'] = 0
+
+        assert reference.value is not value
+
+
+def test_reference_reloaded_after_ttl(app, testdata_reference):
+    with app.app_context():
+        value = reference.value
+
+        app.config['REFERENCE_TTL'] = 0
+
+        assert reference.value is not value
+
+
+def test_reference_warm(app, client, test_user, query_counter, testdata_reference):
+    reference.warm(app)
+
+    del query_counter[:]
+
+    rv = client.get('/semesters/', headers=test_user.auth_headers)
+
+    assert len(rv.get_json()) == 2
+    assert len(query_counter) == 0
@@ -1,7 +1,207 @@
-from ssapi.tasks import add
+import pytest
+from datetime import datetime, timedelta
+from freezegun import freeze_time
+from rq.job import Job
+from redis import RedisError
+from ssapi.cache import cache
+from ssapi.db import db, userpostcheers, Category, Comment, Course, Post, Semester, User
+from ssapi.tasks import add, course_popularity, deliver_mail, forgot_password_email, mail, \
+    queue_once, rq, user_deletion, verification_email
+import ssapi.tasks
 
 
 def test_example_job(app):
     with app.app_context():
         job = add.queue(1, 2)
         assert job.result == 3
+
+
+@pytest.fixture
+def waiting_queues(app, monkeypatch):
+    """
+    queues that keep their jobs waiting for a worker, emptied around the test
+    """
+    monkeypatch.setattr(rq, '_async', True)
+    monkeypatch.setattr(rq, '_queue_instances', {})
+
+    def empty():
+        with app.app_context():
+            rq.connection.delete(*(rq.get_queue(name).key for name in app.config['RQ_QUEUES']))
+
+    empty()
+    yield
+    empty()
+
+
+def test_job_queues(app):
+    assert app.config['RQ_QUEUES'] == ['high', 'default', 'bulk']
+
+    for job in (verification_email, forgot_password_email, deliver_mail):
+        assert job.helper.queue_name == 'high'
+
+    for job in (user_deletion, course_popularity):
+        assert job.helper.queue_name == 'bulk'
+
+    assert add.helper.queue_name == 'default'
+
+
+def test_queue_metrics(app, client, test_user, waiting_queues):
+    with app.app_context():
+        with freeze_time(datetime(2018, 9, 1, 12)):
+            user_deletion.queue(test_user.email, False)
+            user_deletion.queue(test_user.email, True)
+
+        with freeze_time(datetime(2018, 9, 1, 12) + timedelta(seconds=90)):
+            verification_email.queue(test_user.email)
+
+            rv = client.get('/metrics/queues', headers=test_user.auth_headers)
+
+    assert rv.status_code == 200
+    assert rv.get_json() == [
+        {'name': 'high', 'depth': 1, 'latency': 0.0},
+        {'name': 'default', 'depth': 0, 'latency': 0.0},
+        {'name': 'bulk', 'depth': 2, 'latency': 90.0},
+    ]
+
+
+def test_course_popularity(app, test_user):
+    with app.app_context():
+        popular = Course(name='popular', offering_unit='1', subject='1', course_number='1')
+        quiet = Course(name='quiet', offering_unit='1', subject='1', course_number='2')
+        category = Category(name='category')
+        semester = Semester(year=2018, season='fall')
+
+        user = User.query.get(test_user.id)
+        user.courses.append(popular)
+
+        db.session.add_all([Post(title='title', content='content', author=user,
+                                 course=popular, category=category, semester=semester)
+                            for _ in range(3)])
+        db.session.add(quiet)
+        db.session.commit()
+
+        popular_id, quiet_id = popular.id, quiet.id
+
+        course_popularity.queue()
+
+        assert Course.query.get(popular_id).popularity == 4
+        assert Course.query.get(quiet_id).popularity == 0
+
+
+@pytest.fixture
+def testdata_heavy_poster(app, test_user, another_test_user):
+    with app.app_context():
+        app.config['USER_DELETION_CHUNK_SIZE'] = 3
+
+        course = Course(name='course', offering_unit='1', subject='1', course_number='1')
+        category = Category(name='category')
+        semester = Semester(year=2018, season='fall')
+        user = User.query.get(test_user.id)
+        other = User.query.get(another_test_user.id)
+
+        posts = [Post(title='title', content='content', author=user, course=course,
+                      category=category, semester=semester) for _ in range(10)]
+        other_post = Post(title='other', content='other', author=other, course=course,
+                          category=category, semester=semester)
+        other_post.cheers.append(user)
+
+        db.session.add_all(posts + [other_post])
+        db.session.add_all([Comment(content='comment', post=other_post, author=user)
+                            for _ in range(7)])
+        db.session.add(Comment(content='other', post=posts[0], author=other))
+        db.session.commit()
+
+
+def test_user_deletion_in_chunks(app, test_user, another_test_user, query_counter,
+                                 testdata_heavy_poster):
+    with app.app_context(), mail.record_messages() as outbox:
+        del query_counter[:]
+
+        job = user_deletion.queue(test_user.email, True)
+
+        assert job.meta['progress'] == {'posts': 10, 'comments': 7, 'cheers': 1,
+                                        'deleted': True,
+                                        'total': {'posts': 10, 'comments': 7, 'cheers': 1}}
+
+        # a transaction per chunk of at most 3 rows
+        assert len([s for s in query_counter if s.startswith('UPDATE post')]) == 4
+        assert len([s for s in query_counter if s.startswith('UPDATE comment')]) == 3
+
+        assert User.query.get(test_user.id) is None
+        assert Post.query.filter_by(is_deleted=True).count() == 10
+        assert Comment.query.filter_by(is_deleted=True).count() == 7
+        assert db.session.query(userpostcheers).count() == 0
+
+        # nothing of anyone else
+        assert Post.query.filter_by(author_id=another_test_user.id, is_deleted=False).count() == 1
+        assert Comment.query.filter_by(author_id=another_test_user.id,
+                                       is_deleted=False).count() == 1
+
+        assert len(outbox) == 1
+
+
+def test_user_deletion_resumes(app, test_user, monkeypatch, testdata_heavy_poster):
+    save_progress = ssapi.tasks.save_progress
+    saved = []
+
+    def interrupted(job, progress):
+        save_progress(job, progress)
+        saved.append(1)
+
+        # the totals, then two chunks
+        if len(saved) == 3:
+            raise RuntimeError('worker lost')
+
+    with app.app_context(), mail.record_messages() as outbox:
+        job = Job.create(user_deletion, args=(test_user.email, False), connection=rq.connection)
+        job.save()
+
+        monkeypatch.setattr(ssapi.tasks, 'save_progress', interrupted)
+
+        with pytest.raises(RuntimeError):
+            job.perform()
+
+        db.session.rollback()
+
+        # two chunks committed and recorded, the user is still there
+        assert Job.fetch(job.id, connection=rq.connection).meta['progress']['posts'] == 6
+        assert Post.query.filter_by(author_id=None).count() == 6
+        assert User.query.get(test_user.id) is not None
+
+        monkeypatch.setattr(ssapi.tasks, 'save_progress', save_progress)
+
+        job = Job.fetch(job.id, connection=rq.connection)
+        job.perform()
+
+        assert job.meta['progress'] == {'posts': 10, 'comments': 7, 'cheers': 1,
+                                        'deleted': True,
+                                        'total': {'posts': 10, 'comments': 7, 'cheers': 1}}
+        assert Post.query.filter_by(author_id=None).count() == 10
+        assert Post.query.filter_by(is_deleted=True).count() == 0
+        assert User.query.get(test_user.id) is None
+        assert len(outbox) == 1
+
+
+def test_queue_once_failure_releases_claim(app, test_user, monkeypatch):
+    email = test_user.email
+    queue = verification_email.queue
+
+    def unavailable(*args, **kwargs):
+        raise RedisError('queue unavailable')
+
+    with app.app_context():
+        monkeypatch.setattr(verification_email, 'queue', unavailable)
+
+        with pytest.raises(RedisError):
+            queue_once(verification_email, email)
+
+        # nothing was queued, nothing to point repeats at
+        assert cache.connection.get(cache.key('jobs', 'verification_email', email)) is None
+
+        monkeypatch.setattr(verification_email, 'queue', queue)
+
+        with mail.record_messages() as outbox:
+            job_id = queue_once(verification_email, email)
+
+            assert job_id == queue_once(verification_email, email)
+            assert len(outbox) == 1